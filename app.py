@@ -3,29 +3,51 @@
 """ Central module responsible for instantiating the other app components
 and parsing command line configs. """
 
+import time
+STARTED_AT = time.time()
+
 import sys
 import logging
 import argparse
-import time
-import curses
 import atexit
 
-from mongo_commander.data import ClusterData
-from mongo_commander.windows import WindowManager
+# the UI, SSH and remote modules are imported in main once the arguments
+# say which of them this run needs
 
 logging.basicConfig(filename='app.log', level=logging.INFO)
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-c', '--config', default=None, help="Location of YAML config file")
+    parser.add_argument('--serve', default=None, metavar='[HOST:]PORT',
+                        help="Poll the cluster without a UI and serve the data to attached clients. "
+                             "Listens on localhost unless a HOST is given")
+    parser.add_argument('--attach', default=None, metavar='HOST:PORT',
+                        help="Attach to a collector started with --serve instead of polling the cluster")
+    parser.add_argument('--workers', type=int, default=None, metavar='N',
+                        help="Collect in N worker processes, overriding the config")
     args = parser.parse_args()
 
     # atexit.register(curses.endwin)
 
-    data = ClusterData(args.config)
+    if args.attach:
+        from mongo_commander.remote import RemoteClusterData, parse_address
+        data = RemoteClusterData(parse_address(args.attach))
+    else:
+        from mongo_commander.data import ClusterData
+        data = ClusterData(args.config)
+        if args.workers is not None:
+            data.workers = args.workers
     data.start_polling()
 
-    windows = WindowManager(data)
+    if args.serve:
+        from mongo_commander.remote import CollectorServer, parse_address
+        CollectorServer(data, parse_address(args.serve)).start()
+        while True:
+            time.sleep(60)
+
+    from mongo_commander.windows import WindowManager
+    windows = WindowManager(data, started_at=STARTED_AT)
     windows.start()
 
 if __name__ == '__main__':
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+""" Measures the cost of evaluating alert rules as datums are pushed,
+as the number of configured rules grows. The first run spreads the rules
+across many collectors, where the cost per datum should stay flat since
+only the rules for the datum's collector are evaluated. The second puts
+every rule on the collector being pushed to, where each datum is checked
+against each rule and the cost grows linearly with the rule count. """
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_commander.alerts import AlertEngine
+
+HEADER = ("insert  query update delete getmore command flushes mapped  vsize    res faults"
+          "  locked db idx miss %     qr|qw   ar|aw  netIn netOut  conn       time ")
+LINE = ("    *0     *0     *0     *0       0     1|0       0   160m   585m    38m      0"
+        " local:0.0%          0       {}|0     0|0    62b     3k     1   19:07:13 ")
+
+def make_rules(count, local_count):
+    rules = []
+    for index in range(count):
+        # the first local_count rules watch the collector being pushed to
+        collector = 'MongoStat' if index < local_count else 'Other{}'.format(index)
+        rules.append({'name': 'Rule{}'.format(index), 'collector': collector,
+                      'field': 'qr', 'threshold': 50, 'for': 30})
+    return rules
+
+def run(rule_count, local_count, datums):
+    engine = AlertEngine(make_rules(rule_count, local_count))
+    datum = {'data': HEADER, 'time': datetime.utcnow(), 'node_name': 'node',
+             'collector_name': 'MongoStat', 'collector_type': 'MongoStat'}
+    engine.pushed('MongoStat.node', datum)
+    started = time.time()
+    for index in range(datums):
+        datum = dict(datum, data=LINE.format(index % 100))
+        engine.pushed('MongoStat.node', datum)
+    elapsed = time.time() - started
+    return {'rules': rule_count, 'datums': datums,
+            'us_per_datum': elapsed / datums * 1e6,
+            'us_per_evaluation': engine.stats()['mean_evaluation_seconds'] * 1e6}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--datums', type=int, default=20000)
+    parser.add_argument('-r', '--rules', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('-l', '--local', type=int, default=5,
+                        help="Number of the rules that watch the collector being pushed to")
+    parser.add_argument('-c', '--collector-rules', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help="Rule counts for the run with every rule on the pushed collector")
+    args = parser.parse_args()
+    print('Rules spread across collectors, {} on the pushed collector:'.format(args.local))
+    for rule_count in args.rules:
+        result = run(rule_count, min(args.local, rule_count), args.datums)
+        print('{rules:>6} rules: {us_per_datum:8.2f} us/datum '
+              '({us_per_evaluation:.2f} us evaluating)'.format(**result))
+    print('All rules on the pushed collector:')
+    for rule_count in args.collector_rules:
+        result = run(rule_count, rule_count, args.datums)
+        print('{rules:>6} rules: {us_per_datum:8.2f} us/datum '
+              '({us_per_evaluation:.2f} us evaluating, {us_per_rule:.3f} us/rule)'.format(
+                  us_per_rule=result['us_per_evaluation'] / rule_count, **result))
+
+if __name__ == '__main__':
+    main()
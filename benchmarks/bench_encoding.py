@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+""" Measures how fast CompressedSeries encodes and decodes blocks of
+mongod log and mongostat lines, how much smaller they get, and how many
+lines fit in a MB once the search index over them is counted too. """
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_commander.encoding import CompressedSeries, CODECS
+from mongo_commander.retention import value_size
+from mongo_commander.search import LogIndex
+from samples import mongod_log_lines, mongostat_lines
+
+def make_datums(lines, collector_name):
+    started = datetime.utcnow()
+    return [{'data': line, 'time': started + timedelta(milliseconds=index * 50),
+             'node_name': 'shard1-db4-prod', 'collector_name': collector_name,
+             'collector_type': 'Tail'}
+            for index, line in enumerate(lines)]
+
+def index_bytes(series, datums):
+    index = LogIndex([datums[0]['collector_name']], lambda dot_key: series)
+    for datum in datums:
+        index.pushed('bench', datum)
+    return index.nbytes('bench') + index.vocabulary_nbytes
+
+def run_plain(datums):
+    data_bytes = sum(map(value_size, datums))
+    return {'codec': 'none', 'lines': len(datums),
+            'lines_per_mb': len(datums) * 1e6 / (data_bytes + index_bytes([], datums))}
+
+def run(datums, codec):
+    series = CompressedSeries(codec)
+    started = time.time()
+    for datum in datums:
+        series.append(datum)
+    encode_seconds = time.time() - started
+
+    started = time.time()
+    decoded = [series.decode_block(block.payload) for block in series.blocks]
+    decode_seconds = time.time() - started
+    decoded_lines = sum(map(len, decoded))
+    assert [datum['data'] for block in decoded for datum in block] == \
+        [datum['data'] for datum in datums[:decoded_lines]]
+
+    raw_bytes = sum(map(value_size, datums))
+    text_bytes = sum(len(datum['data']) for datum in datums)
+    return {'codec': codec, 'lines': len(datums),
+            'encode_lines_per_second': len(datums) / encode_seconds,
+            'decode_lines_per_second': decoded_lines / decode_seconds,
+            'ratio_vs_datums': float(raw_bytes) / series.nbytes,
+            'ratio_vs_text': float(text_bytes) / series.nbytes,
+            'lines_per_mb': len(datums) * 1e6 / (series.nbytes + index_bytes(series, datums))}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--lines', type=int, default=100000)
+    args = parser.parse_args()
+    for name, lines in (('mongod log', mongod_log_lines(args.lines)),
+                        ('mongostat', mongostat_lines(args.lines))):
+        datums = make_datums(lines, name)
+        print('{:<10} {codec:<5} {lines_per_mb:7.0f} lines/MB with the index'.format(name, **run_plain(datums)))
+        for codec in sorted(CODECS):
+            result = run(datums, codec)
+            print('{:<10} {codec:<5} encode {encode_lines_per_second:9.0f} lines/s  '
+                  'decode {decode_lines_per_second:9.0f} lines/s  '
+                  '{ratio_vs_datums:5.1f}x smaller than datums, {ratio_vs_text:5.1f}x than text  '
+                  '{lines_per_mb:7.0f} lines/MB with the index'.format(name, **result))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+""" Measures what the mongotop hot spots cost as the number of namespaces
+grows: the time to take in a line, and the time to find the hottest
+namespaces for a frame compared with summing and sorting every namespace. """
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_commander.hotspots import NamespaceTop
+from samples import mongotop_lines
+
+def run(namespace_count, nodes, ticks, active, shown):
+    top = NamespaceTop(['MongoTop'])
+    streams = []
+    for node in range(nodes):
+        node_name = 'shard{}-db{}-prod'.format(node // 3, node % 3)
+        lines = mongotop_lines((namespace_count + 2) * ticks, seed=node,
+                               namespace_count=namespace_count, active=active)
+        streams.append([('MongoTop.{}'.format(node_name),
+                         {'data': line, 'time': datetime.utcnow(), 'node_name': node_name,
+                          'collector_name': 'MongoTop', 'collector_type': 'MongoTop'})
+                        for line in lines])
+
+    started = time.time()
+    pushed = 0
+    for stream in streams:
+        for dot_key, datum in stream:
+            top.pushed(dot_key, datum)
+            pushed += 1
+    push_seconds = (time.time() - started) / pushed
+
+    frames = 50
+    started = time.time()
+    for _ in range(frames):
+        top.hottest('total', shown)
+    top_seconds = (time.time() - started) / frames
+
+    # what a frame would cost without the heap
+    started = time.time()
+    for _ in range(frames):
+        totals = defaultdict(float)
+        for node_values in top.current.values():
+            for namespace, values in node_values.items():
+                totals[namespace] += values[0]
+        [{'namespace': namespace, 'value': value,
+          'nodes': dict((node, node_values.get(namespace, (0, 0, 0))[0])
+                        for node, node_values in top.current.items())}
+         for namespace, value in sorted(totals.items(), key=lambda item: -item[1])[:shown]]
+    sort_seconds = (time.time() - started) / frames
+    return push_seconds, top_seconds, sort_seconds
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--ticks', type=int, default=5)
+    parser.add_argument('--active', type=float, default=0.05,
+                        help="Fraction of namespaces busy in each tick")
+    parser.add_argument('--shown', type=int, default=40, help="Namespaces shown per frame")
+    args = parser.parse_args()
+    for namespace_count in (100, 1000, 10000):
+        push_seconds, top_seconds, sort_seconds = run(namespace_count, args.nodes, args.ticks,
+                                                      args.active, args.shown)
+        print('{:>6} namespaces x {} nodes: {:6.1f}us per line, hottest {:8.1f}us per frame '
+              '(sorting everything: {:9.1f}us)'.format(namespace_count, args.nodes, push_seconds * 1e6,
+                                                      top_seconds * 1e6, sort_seconds * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+""" Runs the load simulation with 0 (threads only) and then more collection
+worker processes against the same fleet, to show how ingest throughput and
+the CPU left to the UI process scale with the worker count. Arguments
+other than --counts are passed on to loadsim.py, e.g.
+
+    benchmarks/bench_workers.py --counts 0,1,2,4,8 --nodes 40 --log-rate 100 --transport-us 50
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+LOADSIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'loadsim.py')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--counts', default='0,1,2,4', help="Comma separated worker counts to run")
+    args, loadsim_args = parser.parse_known_args()
+    print('{:>7} {:>10} {:>10} {:>14} {:>14} {:>10}'.format(
+        'workers', 'lines/s', 'offered/s', 'UI CPU us/line', 'delivery ms', 'frame p95'))
+    for count in [int(count) for count in args.counts.split(',')]:
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output([sys.executable, LOADSIM, '--workers', str(count)] + loadsim_args,
+                                             stderr=devnull)
+        result = json.loads(output.decode('utf-8'))
+        print('{:>7} {:>10.0f} {:>10.0f} {:>14.1f} {:>14.1f} {:>10.1f}'.format(
+            count, result['throughput_lines_per_second'], result['offered_lines_per_second'],
+            result['ui_process_cpu_us_per_line'], result['delivery_latency_ms']['mean'],
+            result['frame_ms']['p95']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+
+""" Load simulation for the whole collection and render path. A fake SSH
+transport stands in for a fleet of N nodes, replaying generated mongostat,
+mongotop and mongod log output at configurable line rates. The real
+collectors and ClusterData ingest it while the real views render into
+curses windows on a pseudo-terminal.
+
+Reports startup time, ingest throughput and latency, per-frame render
+time and RSS as JSON, which can be saved as a baseline and compared against later runs:
+
+    benchmarks/loadsim.py --nodes 20 --save baseline.json
+    benchmarks/loadsim.py --nodes 20 --compare baseline.json
+"""
+
+import os
+import re
+import sys
+import pty
+import json
+import time
+import fcntl
+import struct
+import curses
+import platform
+import resource
+import argparse
+import tempfile
+import termios
+import subprocess
+import itertools
+from datetime import datetime
+from collections import deque, defaultdict
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_commander.data import ClusterData
+from mongo_commander.config import cache_path
+from mongo_commander.collectors import get_collector_class
+from mongo_commander.windows import WindowManager
+from samples import mongod_log_lines, mongostat_lines, mongotop_lines
+
+SAMPLE_LINES = 5000
+SAMPLE_VARIANTS = 4  # distinct outputs per command, shared round-robin between nodes
+
+def burn(seconds):
+    """Keep the CPU busy while holding the GIL, like paramiko's Python-side
+    packet handling does."""
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+class FakeChannelFile(object):
+    """Stands in for the stdout of a remote command. Lines become available
+    at `rate` per second from the moment the command is started and are
+    handed out like paramiko's readlines, which blocks until it has
+    `sizehint` bytes or the output ends, or its channel's recv, which blocks
+    until there is any. Either costs `line_cost` seconds of CPU per line."""
+    def __init__(self, stream, lines, rate, line_cost=0):
+        self.stream = stream
+        self.lines = lines
+        self.rate = rate
+        self.line_cost = line_cost
+        self.started = time.time()
+        self.produced = 0
+        self.buffer = deque()
+        self.channel = self
+
+    def _produce(self):
+        if not self.rate:
+            # finite output, all available at once
+            self.buffer.extend((self.started, line) for line in self.lines)
+            return
+        # the lines created up to now, the first at the start
+        due = int((time.time() - self.started) * self.rate) + 1
+        while self.produced < due:
+            line = next(self.lines)
+            created = self.started + float(self.produced) / self.rate
+            self.produced += 1
+            if line is not None:
+                self.buffer.append((created, line))
+
+    def _wait(self):
+        """Sleep until the next line is due."""
+        time.sleep(max(0.001, self.started + float(self.produced) / self.rate - time.time()))
+
+    def readlines(self, sizehint=None):
+        lines, size = [], 0
+        while sizehint is None or size < sizehint:
+            self._produce()
+            if not self.buffer:
+                if not self.rate:
+                    break  # all of the output has been read
+                self._wait()
+                continue
+            created, line = self.buffer.popleft()
+            self.stream.handed_out.append(created)
+            lines.append(line)
+            size += len(line)
+        if self.line_cost:
+            burn(self.line_cost * len(lines))
+        return lines
+
+    def recv(self, nbytes):
+        """Whole lines that have arrived, up to nbytes but at least one, or
+        nothing once the output has ended."""
+        self._produce()
+        while not self.buffer and self.rate:
+            self._wait()
+            self._produce()
+        lines, size = [], 0
+        while self.buffer and (not lines or size + len(self.buffer[0][1]) <= nbytes):
+            created, line = self.buffer.popleft()
+            self.stream.handed_out.append(created)
+            lines.append(line)
+            size += len(line)
+        if self.line_cost:
+            burn(self.line_cost * len(lines))
+        return ''.join(lines).encode('utf-8')
+
+class FakeStream(object):
+    def __init__(self):
+        self.handed_out = deque()  # creation times of lines not yet pushed
+
+class FakeSSHClient(object):
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self.hostname = None
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, hostname, username=None, **kwargs):
+        self.hostname = hostname
+
+    def exec_command(self, command):
+        return None, self.fleet.open(self.hostname, command), None
+
+    def close(self):
+        pass
+
+class Fleet(object):
+    """Knows what every command on every fake host prints."""
+    def __init__(self, node_count, log_rate, stat_rate, top_rate, line_cost=0):
+        self.hosts = ['node{}.sim'.format(index) for index in range(node_count)]
+        self.log_rate = log_rate
+        self.stat_rate = stat_rate
+        self.top_rate = top_rate
+        self.line_cost = line_cost
+        self.streams = defaultdict(FakeStream)
+        # generated up front so the collector threads only replay them
+        self.samples = dict(((generator, seed), generator(SAMPLE_LINES, seed))
+                            for generator in (mongostat_lines, mongotop_lines, mongod_log_lines)
+                            for seed in range(SAMPLE_VARIANTS))
+
+    def client(self):
+        return FakeSSHClient(self)
+
+    def _lines(self, host, command):
+        index = self.hosts.index(host)
+        seed = index % SAMPLE_VARIANTS
+        if 'isMaster' in command:
+            return iter(['true\n' if index == 0 else 'false\n']), 0
+        if 'mongostat' in command:
+            return itertools.cycle(self.samples[(mongostat_lines, seed)]), self.stat_rate
+        if 'mongotop' in command:
+            return itertools.cycle(self.samples[(mongotop_lines, seed)]), self.top_rate
+        lines = itertools.cycle(self.samples[(mongod_log_lines, seed)])
+        grep = re.search(r'grep -E (.*)$', command)
+        if grep:
+            pattern = re.compile(grep.group(1))
+            lines = (line if pattern.search(line) else None for line in lines)
+        return lines, self.log_rate
+
+    def open(self, host, command):
+        lines, rate = self._lines(host, command)
+        return FakeChannelFile(self.streams[(host, command)], lines, rate, self.line_cost)
+
+class IngestRecorder(object):
+    """ClusterData observer that times each line from its creation on the
+    fake host until it is pushed, and from when its datum was built until
+    it is pushed. With collection workers the fake hosts live in the worker
+    processes, so only the second can be measured."""
+    def __init__(self, fleet, data):
+        self.streams = {}
+        hosts = dict((node['name'], node['host']) for node in data.config['nodes'])
+        for collector_doc in data.config['collectors']:
+            command = get_collector_class(collector_doc)(data, None, collector_doc).command
+            for node_name, host in hosts.items():
+                self.streams[(node_name, collector_doc['name'])] = fleet.streams[(host, command)]
+        self.latencies = []
+        self.deliveries = []
+        self.pushed_count = 0
+
+    def pushed(self, dot_key, datum):
+        stream = self.streams.get((datum.get('node_name'), datum.get('collector_name')))
+        if stream is not None and stream.handed_out:
+            self.latencies.append(time.time() - stream.handed_out.popleft())
+        if 'time' in datum:
+            self.deliveries.append((datetime.utcnow() - datum['time']).total_seconds())
+        self.pushed_count += 1
+
+    def evicted(self, dot_key, datums):
+        pass
+
+class VirtualScreen(object):
+    """Runs curses against a pseudo-terminal of the given size, so views
+    render for real without touching the benchmark's own terminal."""
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+
+    def __enter__(self):
+        self.master, self.slave = pty.openpty()
+        fcntl.ioctl(self.slave, termios.TIOCSWINSZ, struct.pack('HHHH', self.rows, self.cols, 0, 0))
+        self.saved_stdout, self.saved_stdin = os.dup(1), os.dup(0)
+        sys.stdout.flush()
+        os.dup2(self.slave, 1)
+        os.dup2(self.slave, 0)
+        os.environ.setdefault('TERM', 'xterm')
+        os.environ['LINES'], os.environ['COLUMNS'] = str(self.rows), str(self.cols)
+        # curses holds the GIL while it writes, so the pty has to be drained
+        # by another process or a full buffer would deadlock the benchmark
+        self.drain = subprocess.Popen(['cat'], stdin=self.master, stdout=open(os.devnull, 'w'))
+        self.screen = curses.initscr()
+        curses.start_color()
+        return self.screen
+
+    def __exit__(self, *exc_info):
+        curses.endwin()
+        os.dup2(self.saved_stdout, 1)
+        os.dup2(self.saved_stdin, 0)
+        self.drain.terminate()
+
+def summarize(samples, scale=1000.0):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    pick = lambda fraction: ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * scale
+    return {'mean': sum(ordered) / len(ordered) * scale, 'p50': pick(0.5),
+            'p95': pick(0.95), 'max': ordered[-1] * scale, 'count': len(ordered)}
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except IOError:
+        return None
+
+def write_config(args, fleet):
+    config = {'ssh': {'user': 'bench', 'auth_type': 'key', 'key_path': '~/.ssh/none'},
+              'nodes': [{'name': host.split('.')[0], 'host': host, 'mongo_port': 27018}
+                        for host in fleet.hosts],
+              'collectors': [
+                  {'name': 'MongoTop', 'type': 'MongoTop', 'port': 27018},
+                  {'name': 'MongoStat', 'type': 'MongoStat', 'port': 27018},
+                  {'name': 'TailSlowLog', 'type': 'Tail', 'file': '/logs/mongo/db.log',
+                   'retention': {'lines': args.retention, 'compress': args.compress or False}},
+                  {'name': 'SlowQueries', 'type': 'TailGrep', 'file': '/logs/mongo/db.log',
+                   'grep': 'r:[0-9]{5,7}'}],
+              'alerts': [{'name': 'QueuedReads', 'collector': 'MongoStat', 'field': 'qr',
+                          'threshold': 50, 'for': 5}]}
+    if args.memory_budget:
+        config['memory_budget'] = args.memory_budget
+    handle, path = tempfile.mkstemp(suffix='.yml')
+    with os.fdopen(handle, 'w') as f:
+        yaml.safe_dump(config, f)
+    return path
+
+def import_seconds():
+    """Time a fresh interpreter takes to import what app.py needs before
+    it can draw its first frame."""
+    code = ('import time; started = time.time(); '
+            'import mongo_commander.data, mongo_commander.windows; '
+            'print(time.time() - started)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return float(subprocess.check_output([sys.executable, '-c', code], cwd=root))
+
+def run(args):
+    imported = import_seconds()
+    fleet = Fleet(args.nodes, args.log_rate, args.stat_rate, args.top_rate, args.transport_us / 1e6)
+    config_path = write_config(args, fleet)
+    started = time.time()
+    data = ClusterData(config_path, ssh_client_factory=fleet.client)
+    data.workers = args.workers
+    os.remove(config_path)
+    if os.path.exists(cache_path(config_path)):
+        os.remove(cache_path(config_path))
+    recorder = IngestRecorder(fleet, data)
+    data.observers.append(recorder)
+    data.start_polling()
+
+    frames, view_times = [], defaultdict(list)
+    with VirtualScreen(args.rows, args.cols) as screen:
+        windows = WindowManager(data)
+        windows.screen = screen
+        windows._create_windows()
+        collectors = data.config['collectors']
+        deadline = started + args.duration
+        frame = 0
+        first_frame = None
+        while time.time() < deadline:
+            # cycle the main view through every collector
+            collector_doc = collectors[frame % len(collectors)]
+            windows.views['main'] = windows.view_class_for_collector(collector_doc)(
+                data, windows.windows['main'], collector_doc['name'])
+            frame_started = time.time()
+            for view in list(windows.views.values()):
+                view_started = time.time()
+                windows.render_view(view)
+                view_times[view.__class__.__name__].append(time.time() - view_started)
+            curses.doupdate()
+            frames.append(time.time() - frame_started)
+            if first_frame is None:
+                first_frame = time.time() - started
+            frame += 1
+            time.sleep(max(0, args.frame_interval - (time.time() - frame_started)))
+    elapsed = time.time() - started
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    return {'params': vars(args),
+            'python': platform.python_version(),
+            'elapsed_seconds': elapsed,
+            # import time in a fresh interpreter, then loading the config
+            # and drawing every view once
+            'startup_ms': {'imports': imported * 1e3,
+                           'first_frame': (imported + first_frame) * 1e3},
+            'lines_pushed': recorder.pushed_count,
+            'throughput_lines_per_second': recorder.pushed_count / elapsed,
+            # TailGrep only pushes the log lines its pattern matches
+            'offered_lines_per_second': args.nodes * (args.log_rate + args.stat_rate + args.top_rate),
+            'ingest_latency_ms': summarize(recorder.latencies),
+            'delivery_latency_ms': summarize(recorder.deliveries),
+            'frame_ms': summarize(frames),
+            'view_ms': dict((name, summarize(times)) for name, times in view_times.items()),
+            # CPU used by this process, which is all of collection unless
+            # it is split between worker processes
+            'ui_process_cpu_us_per_line': (usage.ru_utime + usage.ru_stime) / max(1, recorder.pushed_count) * 1e6,
+            'rss_mb': rss_mb(),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+            'data_mb': data.total_size / 1e6,
+            'alert_evaluation_us': data.alerts.stats()['mean_evaluation_seconds'] * 1e6}
+
+def flatten(result, prefix=''):
+    flat = {}
+    for key, value in result.items():
+        if key == 'params':
+            continue
+        if isinstance(value, dict):
+            flat.update(flatten(value, '{}{}.'.format(prefix, key)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+def compare(result, baseline):
+    current, previous = flatten(result), flatten(baseline)
+    for key in sorted(set(current) & set(previous)):
+        change = (current[key] - previous[key]) / previous[key] * 100 if previous[key] else 0
+        print('{:<40} {:>12.3f} -> {:>12.3f} ({:+.1f}%)'.format(key, previous[key], current[key], change))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=15, help="Seconds to run for")
+    parser.add_argument('--log-rate', type=float, default=20, help="Log lines per second per node")
+    parser.add_argument('--stat-rate', type=float, default=1, help="mongostat lines per second per node")
+    parser.add_argument('--top-rate', type=float, default=30, help="mongotop lines per second per node")
+    parser.add_argument('--transport-us', type=float, default=0,
+                        help="CPU microseconds the fake SSH transport spends per line")
+    parser.add_argument('--workers', type=int, default=0, help="Collection worker processes")
+    parser.add_argument('--retention', type=int, default=500, help="Log lines kept per node")
+    parser.add_argument('--compress', default=None, help="Compress retained log lines (zlib or lz4)")
+    parser.add_argument('--memory-budget', default=None)
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--cols', type=int, default=200)
+    parser.add_argument('--frame-interval', type=float, default=1.0)
+    parser.add_argument('--save', default=None, help="Write the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="Compare against results saved earlier")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2, sort_keys=True))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+if __name__ == '__main__':
+    main()
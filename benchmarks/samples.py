@@ -0,0 +1,85 @@
+""" Synthetic but realistic output of the commands the collectors run,
+for benchmarks. Generators are seeded so runs can be compared. """
+
+import random
+
+DATABASES = ['app', 'analytics', 'sessions', 'billing']
+COLLECTIONS = ['users', 'events', 'teams', 'games', 'stats', 'invoices', 'devices']
+OPERATIONS = ['query', 'update', 'remove', 'getmore', 'insert']
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+MONGOSTAT_HEADER = ("insert  query update delete getmore command flushes mapped  vsize    res faults"
+                    "  locked db idx miss %     qr|qw   ar|aw  netIn netOut  conn set repl       time \n")
+
+def namespaces(count=None):
+    names = ['{}.{}'.format(db, collection) for db in DATABASES for collection in COLLECTIONS]
+    if count is not None:
+        names = (names + ['tenant{}.{}'.format(index // len(COLLECTIONS), COLLECTIONS[index % len(COLLECTIONS)])
+                          for index in range(max(0, count - len(names)))])[:count]
+    return names
+
+def _clock(rng, second):
+    return '{} {} {:2d} {:02d}:{:02d}:{:02d}.{:03d}'.format(
+        DAYS[second // 86400 % 7], MONTHS[3], 25, second // 3600 % 24, second // 60 % 60,
+        second % 60, rng.randint(0, 999))
+
+def mongod_log_lines(count, seed=0):
+    """Slow operation and connection lines in the mongod 2.4 log format."""
+    rng = random.Random(seed)
+    all_namespaces = namespaces()
+    lines = []
+    for index in range(count):
+        clock = _clock(rng, index // 20)
+        connection = rng.randint(1000, 9999)
+        if rng.random() < 0.1:
+            lines.append('{} [initandlisten] connection accepted from 10.0.{}.{}:{} #{} ({} connections now open)\n'.format(
+                clock, rng.randint(0, 9), rng.randint(1, 254), rng.randint(30000, 60000),
+                connection, rng.randint(100, 400)))
+            continue
+        operation = rng.choice(OPERATIONS)
+        lines.append('{} [conn{}] {} {} query: {{ team_id: ObjectId(\'{:024x}\'), created: {{ $gte: new Date({}) }} }} '
+                     'ntoreturn:0 ntoskip:0 nscanned:{} keyUpdates:0 numYields: {} locks(micros) r:{} nreturned:{} '
+                     'reslen:{} {}ms\n'.format(
+                         clock, connection, operation, rng.choice(all_namespaces), rng.getrandbits(96),
+                         1395700000000 + rng.randint(0, 10 ** 8), rng.randint(0, 50000), rng.randint(0, 20),
+                         rng.randint(100, 900000), rng.randint(0, 500), rng.randint(20, 90000),
+                         rng.randint(100, 9000)))
+    return lines
+
+def mongostat_lines(count, seed=0):
+    """mongostat output, with the header repeated every 20 lines like the real tool."""
+    rng = random.Random(seed)
+    lines = []
+    for index in range(count):
+        if index % 20 == 0:
+            lines.append(MONGOSTAT_HEADER)
+            continue
+        lines.append('{:>6} {:>6} {:>6} {:>6} {:>7} {:>7} {:>7} {:>6} {:>6} {:>6} {:>6} {:>10} {:>10} {:>9} {:>7} {:>6} {:>6} {:>5} {:>3} {:>4} {:>10} \n'.format(
+            '*{}'.format(rng.randint(0, 9)), rng.randint(0, 900), rng.randint(0, 300), rng.randint(0, 50),
+            rng.randint(0, 90), '{}|0'.format(rng.randint(0, 60)), 0, '160g', '321g', '{}g'.format(rng.randint(20, 30)),
+            rng.randint(0, 40), 'app:{:.1f}%'.format(rng.random() * 30), 0,
+            '{}|{}'.format(rng.randint(0, 80), rng.randint(0, 10)), '{}|{}'.format(rng.randint(0, 8), rng.randint(0, 4)),
+            '{}k'.format(rng.randint(10, 900)), '{}m'.format(rng.randint(1, 9)), rng.randint(100, 400),
+            'rs0', 'PRI', '19:{:02d}:{:02d}'.format(index // 60 % 60, index % 60)))
+    return lines
+
+def mongotop_lines(count, seed=0, namespace_count=None, active=1.0):
+    """mongotop output: a timestamped header followed by one line per namespace.
+    Each tick only `active` of the namespaces spend any time."""
+    rng = random.Random(seed)
+    all_namespaces = namespaces(namespace_count)
+    lines = []
+    second = 0
+    while len(lines) < count:
+        lines.append('{:>40} {:>11} {:>11} {:>11}\t\t2014-04-25T19:{:02d}:{:02d}\n'.format(
+            'ns', 'total', 'read', 'write', second // 60 % 60, second % 60))
+        for namespace in all_namespaces:
+            read, write = 0, 0
+            if active >= 1.0 or rng.random() < active:
+                read, write = rng.randint(0, 400), rng.randint(0, 200)
+            lines.append('{:>40} {:>11} {:>11} {:>11}\n'.format(
+                namespace, '{}ms'.format(read + write), '{}ms'.format(read), '{}ms'.format(write)))
+        lines.append('\n')
+        second += 1
+    return lines[:count]
@@ -0,0 +1,278 @@
+"""Alert rules declared under `alerts` in the config. Rules are compiled
+once and checked against each datum as it is pushed into ClusterData, so
+the cost of a push only depends on the rules for that datum's collector."""
+
+import re
+import os
+import time
+import logging
+import operator
+import threading
+import subprocess
+from collections import defaultdict, deque
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from .parsers import ColumnParser, parse_number
+
+OPERATORS = {'>': operator.gt, '>=': operator.ge,
+             '<': operator.lt, '<=': operator.le,
+             '==': operator.eq, '!=': operator.ne}
+SAMPLE_INTERVAL = 5  # default seconds a subject can go without a line and stay pending
+PENDING_SWEEP_INTERVAL = 60  # seconds between drops of pending subjects gone quiet
+
+class Rule(object):
+    # if True, the rule needs the datum parsed into mongostat/mongotop columns
+    needs_fields = False
+
+    def __init__(self, rule_doc):
+        self.rule_doc = rule_doc
+        self.name = rule_doc['name']
+        self.collector_name = rule_doc['collector']
+        self.threshold = float(rule_doc['threshold'])
+        self.duration = float(rule_doc.get('for', 0))
+        # a longer gap between lines breaks a run of breaching values
+        self.max_gap = max(self.duration, float(rule_doc.get('interval', SAMPLE_INTERVAL)))
+        try:
+            self.compare = OPERATORS[rule_doc.get('op', '>')]
+        except KeyError:
+            raise ValueError('alert {} has unknown op {}'.format(self.name, rule_doc['op']))
+        self.group = re.compile(rule_doc['group']) if rule_doc.get('group') else None
+        self.group_field = rule_doc.get('group_field')
+        self.needs_fields = self.group_field is not None
+
+    def subject(self, datum, fields):
+        """The node, or node and group, that this datum counts towards.
+        Returns None if the datum has no group."""
+        if self.group_field:
+            if not fields or self.group_field not in fields:
+                return None
+            return '{}:{}'.format(datum['node_name'], fields[self.group_field])
+        if self.group is None:
+            return datum['node_name']
+        match = self.group.search(str(datum['data']))
+        if not match:
+            return None
+        return '{}:{}'.format(datum['node_name'], match.group(1) if match.groups() else match.group())
+
+    def evaluate(self, datum, fields, now):
+        """Return (subject, value) for this datum, or None if it does not apply."""
+        raise NotImplementedError()
+
+class ThresholdRule(Rule):
+    """Compares a column (`field`) or the `value` group of a regex
+    (`pattern`) from each line against the threshold."""
+    def __init__(self, rule_doc):
+        super(ThresholdRule, self).__init__(rule_doc)
+        self.field = rule_doc.get('field')
+        self.pattern = re.compile(rule_doc['pattern']) if rule_doc.get('pattern') else None
+        if not (self.field or self.pattern):
+            raise ValueError('alert {} needs a field or a pattern'.format(self.name))
+        self.needs_fields = self.needs_fields or self.field is not None
+
+    def evaluate(self, datum, fields, now):
+        if self.field:
+            if not fields or self.field not in fields:
+                return None
+            value = parse_number(fields[self.field])
+        else:
+            match = self.pattern.search(str(datum['data']))
+            if not match:
+                return None
+            value = parse_number(match.groupdict().get('value') or match.group(match.lastindex or 0))
+        if value is None:
+            return None
+        subject = self.subject(datum, fields)
+        if subject is None:
+            return None
+        return subject, value
+
+class RateRule(Rule):
+    """Counts lines (optionally only those matching `pattern`) per subject
+    over a sliding window of `per` seconds."""
+    def __init__(self, rule_doc):
+        super(RateRule, self).__init__(rule_doc)
+        self.per = float(rule_doc.get('per', 60))
+        self.pattern = re.compile(rule_doc['pattern']) if rule_doc.get('pattern') else None
+        self.windows = defaultdict(deque)
+        self.swept_at = 0
+
+    def evaluate(self, datum, fields, now):
+        if now - self.swept_at >= self.per:
+            self.sweep(now)
+        if self.pattern and not self.pattern.search(str(datum['data'])):
+            return None
+        subject = self.subject(datum, fields)
+        if subject is None:
+            return None
+        window = self.windows[subject]
+        window.append(now)
+        return subject, self.current(subject, now)
+
+    def current(self, subject, now):
+        window = self.windows.get(subject)
+        if window is None:
+            return 0
+        while window and window[0] <= now - self.per:
+            window.popleft()
+        if not window:
+            del self.windows[subject]
+        return len(window)
+
+    def sweep(self, now):
+        """Drop the windows of subjects with no lines in the last `per`
+        seconds, which would otherwise be kept for every subject ever
+        seen."""
+        for subject in [subject for subject, window in self.windows.items()
+                        if window[-1] <= now - self.per]:
+            del self.windows[subject]
+        self.swept_at = now
+
+def compile_rule(rule_doc):
+    return (RateRule if rule_doc.get('rate') else ThresholdRule)(rule_doc)
+
+class AlertEngine(object):
+    """Evaluates compiled rules as datums are pushed and tracks which
+    alerts are firing. Firing and resolving alerts are optionally appended
+    to `alerts_file` and passed to the `alerts_hook` shell command. Both
+    are done by a notifier thread, so a slow disk or hook never holds up
+    a push.
+
+    With collection workers, each worker evaluates the rules for its own
+    nodes and notifies; the UI process's engine only mirrors what is firing
+    there."""
+    def __init__(self, rule_docs, alerts_file=None, alerts_hook=None):
+        self.rules = [compile_rule(rule_doc) for rule_doc in rule_docs or []]
+        self.rules_by_collector = defaultdict(list)
+        for rule in self.rules:
+            self.rules_by_collector[rule.collector_name].append(rule)
+        self.parsed_collectors = set(rule.collector_name for rule in self.rules if rule.needs_fields)
+        self.alerts_file = os.path.expanduser(alerts_file) if alerts_file else None
+        self.alerts_hook = alerts_hook
+        self.lock = threading.RLock()
+        self.parsers = defaultdict(ColumnParser)
+        self.pending = {}  # (rule name, subject) -> (breaching since, expires at)
+        self.pending_swept_at = 0
+        self.firing = {}
+        self.mirrored = {}  # worker -> alerts firing there
+        self.evaluations = 0
+        self.evaluation_seconds = 0.0
+        self.notifications = queue.Queue()
+        self.notifier = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('alerts'), config.get('alerts_file'), config.get('alerts_hook'))
+
+    def pushed(self, dot_key, datum):
+        if not isinstance(datum, dict):
+            return
+        rules = self.rules_by_collector.get(datum.get('collector_name'))
+        if not rules:
+            return
+        with self.lock:
+            started = time.time()
+            if started - self.pending_swept_at >= PENDING_SWEEP_INTERVAL:
+                self._sweep_pending(started)
+            fields = None
+            if datum['collector_name'] in self.parsed_collectors:
+                fields = self.parsers[dot_key].parse(str(datum['data']))
+            for rule in rules:
+                result = rule.evaluate(datum, fields, started)
+                if result is not None:
+                    self._update(rule, result[0], result[1], started)
+            self.evaluations += 1
+            self.evaluation_seconds += time.time() - started
+
+    def evicted(self, dot_key, datums):
+        pass
+
+    def _update(self, rule, subject, value, now):
+        key = (rule.name, subject)
+        if not rule.compare(value, rule.threshold):
+            self.pending.pop(key, None)
+            if key in self.firing:
+                self._notify('resolved', self.firing.pop(key))
+            return
+        pending = self.pending.get(key)
+        since = now if pending is None or now > pending[1] else pending[0]
+        self.pending[key] = (since, now + rule.max_gap)
+        if key in self.firing:
+            self.firing[key]['value'] = value
+        elif now - since >= rule.duration:
+            self.firing[key] = {'name': rule.name, 'subject': subject,
+                                'node_name': subject.split(':', 1)[0],
+                                'value': value, 'since': since}
+            self._notify('firing', self.firing[key])
+
+    def _sweep_pending(self, now):
+        """Drop the pending runs of subjects that have not reported for
+        longer than their rule allows, which would otherwise be kept for
+        every subject that ever breached."""
+        for key in [key for key, (since, expires) in self.pending.items() if now > expires]:
+            del self.pending[key]
+        self.pending_swept_at = now
+
+    def _expire_rates(self, now):
+        for rule in self.rules:
+            if not isinstance(rule, RateRule):
+                continue
+            for (name, subject) in list(self.firing):
+                if name == rule.name:
+                    self._update(rule, subject, rule.current(subject, now), now)
+
+    def mirror(self, worker, alerts):
+        """Take alerts as those firing in worker, in place of what it sent
+        before."""
+        with self.lock:
+            self.mirrored[worker] = alerts
+
+    def firing_alerts(self):
+        with self.lock:
+            self._expire_rates(time.time())
+            alerts = list(self.firing.values())
+            for mirrored in self.mirrored.values():
+                alerts.extend(mirrored)
+            return sorted(alerts, key=lambda alert: alert['since'])
+
+    def stats(self):
+        with self.lock:
+            return {'rules': len(self.rules),
+                    'evaluations': self.evaluations,
+                    'mean_evaluation_seconds': self.evaluation_seconds / max(self.evaluations, 1)}
+
+    def _notify(self, state, alert):
+        message = '{} {} {} {} value={}'.format(time.strftime('%c'), state.upper(),
+                                                alert['name'], alert['subject'], alert['value'])
+        self.notifications.put((state, dict(alert), message))
+        if self.notifier is None:
+            self.notifier = threading.Thread(target=self._deliver_forever)
+            self.notifier.daemon = True
+            self.notifier.start()
+
+    def _deliver_forever(self):
+        while True:
+            state, alert, message = self.notifications.get()
+            try:
+                self._deliver(state, alert, message)
+            finally:
+                self.notifications.task_done()
+
+    def _deliver(self, state, alert, message):
+        logging.info(message)
+        if self.alerts_file:
+            try:
+                with open(self.alerts_file, 'a') as f:
+                    f.write(message + '\n')
+            except IOError:
+                logging.exception('Could not write alert to {}'.format(self.alerts_file))
+        if self.alerts_hook:
+            env = dict(os.environ, MC_ALERT_STATE=state, MC_ALERT_NAME=alert['name'],
+                       MC_ALERT_SUBJECT=alert['subject'], MC_ALERT_VALUE=str(alert['value']))
+            try:
+                subprocess.Popen(self.alerts_hook, shell=True, env=env)
+            except OSError:
+                logging.exception('Could not run alert hook {}'.format(self.alerts_hook))
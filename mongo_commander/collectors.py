@@ -5,6 +5,8 @@ import time
 from datetime import datetime
 import logging
 
+from .retention import Retention
+
 def get_collector_class(collector_doc):
     collectors = {'MongoTop': MongoTop,
                   'MongoStat': MongoStat,
@@ -15,12 +17,17 @@ def get_collector_class(collector_doc):
 class Collector(object):
     # if True, thread does not go unhealthy on long wait for output
     _infrequent = False
+    # if True, lines are added to ClusterData's search index
+    _searchable = False
+    # if True, lines are mongotop output tracked by ClusterData's hotspots
+    _hotspots = False
 
     def __init__(self, data, controller, collector_doc):
         self.data = data
         self.controller = controller
         self.collector_doc = collector_doc
         self.name = collector_doc.get('name')
+        self.retention = Retention.from_doc(collector_doc)
         self.poll_interval = 1  # seconds between running command
 
     def _datum(self, data):
@@ -55,6 +62,8 @@ class Collector(object):
         raise NotImplementedError()
 
 class MongoTop(Collector):
+    _hotspots = True
+
     def __init__(self, *args, **kwargs):
         super(MongoTop, self).__init__(*args, **kwargs)
         self.path = self.collector_doc.get('path')
@@ -73,7 +82,7 @@ class MongoTop(Collector):
     def process(self, stdout):
         for line in stdout:
             self.data.push('{}.{}'.format(self.name, self.controller.node_name),
-                           self._datum(line), 500)
+                           self._datum(line), self.retention)
 
 class MongoStat(Collector):
     def __init__(self, *args, **kwargs):
@@ -94,7 +103,7 @@ class MongoStat(Collector):
     def process(self, stdout):
         for line in stdout:
             self.data.push('{}.{}'.format(self.name, self.controller.node_name),
-                           self._datum(line), 500)
+                           self._datum(line), self.retention)
 
 class MongoStat(Collector):
     def __init__(self, *args, **kwargs):
@@ -115,10 +124,11 @@ class MongoStat(Collector):
     def process(self, stdout):
         for line in stdout:
             self.data.push('{}.{}'.format(self.name, self.controller.node_name),
-                           self._datum(line), 500)
+                           self._datum(line), self.retention)
 
 class Tail(Collector):
     _infrequent = True
+    _searchable = True
 
     def __init__(self, *args, **kwargs):
         super(Tail, self).__init__(*args, **kwargs)
@@ -131,10 +141,11 @@ class Tail(Collector):
     def process(self, stdout):
         for line in stdout:
             self.data.push('{}.{}'.format(self.name, self.controller.node_name),
-                           self._datum(line), 500)
+                           self._datum(line), self.retention)
 
 class TailGrep(Collector):
     _infrequent = True
+    _searchable = True
 
     def __init__(self, *args, **kwargs):
         super(TailGrep, self).__init__(*args, **kwargs)
@@ -148,4 +159,4 @@ class TailGrep(Collector):
     def process(self, stdout):
         for line in stdout:
             self.data.push('{}.{}'.format(self.name, self.controller.node_name),
-                           self._datum(line), 500)
+                           self._datum(line), self.retention)
@@ -0,0 +1,66 @@
+"""Loads the YAML config. Parsing is done with libyaml's C loader when
+PyYAML was built with it, and the parsed config is cached per user as JSON
+so an unchanged file is not parsed again on the next start. JSON, unlike a
+pickle, cannot run code when it is read back."""
+
+import os
+import json
+import hashlib
+import logging
+
+def cache_directory():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, 'mongo_commander')
+
+def cache_path(config_path):
+    digest = hashlib.sha1(os.path.realpath(config_path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_directory(), 'config-{}.json'.format(digest))
+
+def _stamp(config_path):
+    stat = os.stat(config_path)
+    return (stat.st_mtime, stat.st_size)
+
+def parse_yaml(text):
+    import yaml
+    return yaml.load(text, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+def load_config(config_path, use_cache=True):
+    """Return the parsed config at config_path, from the cache if the file
+    has not changed since it was last parsed."""
+    stamp = _stamp(config_path)
+    cached_path = cache_path(config_path)
+    if use_cache:
+        try:
+            with open(cached_path, 'r') as f:
+                cached = json.load(f)
+            if cached['stamp'] == list(stamp):
+                return cached['config']
+        except Exception:
+            pass
+
+    with open(config_path, 'r') as f:
+        config = parse_yaml(f.read())
+
+    if use_cache:
+        _cache(cached_path, stamp, config)
+    return config
+
+def _cache(cached_path, stamp, config):
+    # YAML can give what JSON has no way to hold, such as dates or keys
+    # that are not strings, and such a config is parsed every time instead
+    try:
+        text = json.dumps({'stamp': stamp, 'config': config})
+    except (TypeError, ValueError):
+        text = None
+    if text is None or json.loads(text)['config'] != config:
+        logging.info('Not caching the parsed config: it does not round trip through JSON')
+        return
+    try:
+        if not os.path.isdir(cache_directory()):
+            os.makedirs(cache_directory())
+        temporary_path = '{}.{}'.format(cached_path, os.getpid())
+        with open(temporary_path, 'w') as f:
+            f.write(text)
+        os.rename(temporary_path, cached_path)
+    except (IOError, OSError) as e:
+        logging.info('Not caching the parsed config: {}'.format(e))
@@ -1,3 +1,4 @@
 TEXT = "Text"
 BAR_CHART = "Bar Chart"
 LINE_CHART = "Line Chart"
+HEATMAP = "Heatmap"
@@ -8,3 +8,8 @@ def movedown(window, rows=1, x=None):
 def movex(window, new_x):
     current_y = window.getyx()[0]
     window.move(current_y, new_x)
+
+def clamp_offset(offset, total, height):
+    """Keep a scroll offset into a list of total rows, shown height rows at
+    a time, within the list."""
+    return max(0, min(offset, total - height))
@@ -7,26 +7,80 @@ import inspect
 import getpass
 import threading
 import time
+import heapq
 import logging
+from datetime import datetime
 
-import yaml
-import paramiko
-
+from .config import load_config
 from .collectors import get_collector_class
+from .alerts import AlertEngine
+from .search import LogIndex
+from .hotspots import NamespaceTop
+from .retention import Retention, value_size, parse_bytes
+from .encoding import CompressedSeries
 
 this_file_location = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 default_config_location = os.path.realpath(os.path.join(this_file_location,
                                                         'config.yml'))
 SENTINEL = object()
+BUDGET_LOW_WATER = 0.9  # fraction of memory_budget to evict down to once exceeded
+READ_SIZE = 1024  # most bytes of output taken at a time from each command
+PUSH_CHUNK = 256  # values push_many pushes per acquisition of the lock
+
+def paramiko_client():
+    import paramiko
+    return paramiko.SSHClient()
+
+def load_private_key(key_path, password=None):
+    """Parse the private key at key_path with whichever paramiko key type
+    accepts it. Returns None if none does, leaving paramiko to try the file
+    itself when connecting."""
+    if not key_path or not os.path.isfile(key_path):
+        return None
+    import paramiko
+    for name in ('RSAKey', 'ECDSAKey', 'Ed25519Key', 'DSSKey'):
+        key_class = getattr(paramiko, name, None)
+        if key_class is None:
+            continue
+        try:
+            return key_class.from_private_key_file(key_path, password=password)
+        except (paramiko.SSHException, IOError, ValueError):
+            continue
+    return None
 
 class ClusterData(object):
-    def __init__(self, config_path):
+    def __init__(self, config_path, ssh_client_factory=None):
         self.config_path = config_path or default_config_location
+        # builds the SSH clients used to reach the nodes; replaceable so the
+        # collectors can be driven without real hosts
+        self.ssh_client_factory = ssh_client_factory or paramiko_client
+        self._ssh_key = SENTINEL
+        self._ssh_key_lock = threading.Lock()
         self.load_config()
         self.nodes = self.config['nodes']
         self.lock = threading.RLock()
         self._dict = {}
+        self._counts = {}
+        self._series = {}
+        self._sizes = {}
+        self._index_sizes = {}
+        self._vocabulary_size = 0
+        self._retention = {}
+        self.total_size = 0
+        self.memory_budget = parse_bytes(self.config.get('memory_budget'))
+        # worker processes to collect in, or 0 for threads in this process
+        self.workers = int(self.config.get('workers') or 0)
         self.listeners = []
+        self.alerts = AlertEngine.from_config(self.config)
+        self.search_index = LogIndex([collector_doc['name']
+                                      for collector_doc in self.config['collectors']
+                                      if get_collector_class(collector_doc)._searchable],
+                                     self.get)
+        self.hotspots = NamespaceTop([collector_doc['name']
+                                      for collector_doc in self.config['collectors']
+                                      if get_collector_class(collector_doc)._hotspots])
+        # told of every push and eviction after the search index
+        self.observers = [self.alerts, self.hotspots]
 
     def __getitem__(self, key):
         self.get(key)
@@ -35,13 +89,20 @@ class ClusterData(object):
         self.set(key, value)
 
     def load_config(self):
-        with open(self.config_path, 'r') as f:
-            self.config = yaml.load(f.read())
+        self.config = load_config(self.config_path)
         if self.config['ssh']['auth_type'] == 'password':
             self.ssh_password = getpass.getpass("SSH key password: ")
         else:
             self.ssh_password = None
 
+    def ssh_key(self, key_path):
+        """The private key at key_path, parsed and decrypted once and then
+        shared by every connection to the nodes."""
+        with self._ssh_key_lock:
+            if self._ssh_key is SENTINEL:
+                self._ssh_key = load_private_key(key_path, self.ssh_password)
+            return self._ssh_key
+
     def get(self, dot_key, default=SENTINEL):
         with self.lock:
             value = self._deep_get(dot_key)
@@ -56,9 +117,166 @@ class ClusterData(object):
         with self.lock:
             self._deep_set(dot_key, value)
 
-    def push(self, dot_key, value, truncate_to=None):
+    def push(self, dot_key, value, retention=None):
+        """Append value to the series at dot_key. retention is a Retention
+        or a line count; it applies to the series from then on."""
+        self._push_chunk(dot_key, [value], Retention.coerce(retention))
+
+    def push_many(self, dot_key, values, retention=None, tokens=None):
+        """Push each of values in turn. tokens, if given, are the search
+        tokens of each value's line, already found by a worker. The lock is
+        taken once per PUSH_CHUNK values, so a large batch from a worker
+        does not keep the views from rendering until all of it is in."""
+        retention = Retention.coerce(retention)
+        for start in range(0, len(values), PUSH_CHUNK):
+            self._push_chunk(dot_key, values[start:start + PUSH_CHUNK], retention,
+                             tokens and tokens[start:start + PUSH_CHUNK])
+
+    def _push_chunk(self, dot_key, values, retention, tokens=None):
         with self.lock:
-            self._deep_append(dot_key, value, truncate_to)
+            if retention is not None:
+                if retention.compress and dot_key not in self._series:
+                    self._deep_set(dot_key, CompressedSeries(retention.compress))
+                self._retention[dot_key] = retention
+            retention = self._retention.get(dot_key)
+            for index, value in enumerate(values):
+                series = self._deep_append(dot_key, value)
+                self._series[dot_key] = series
+                self._counts[dot_key] = self._counts.get(dot_key, 0) + 1
+                self._account(dot_key, value_size(value))
+                # the index is told while the lock is held, so it always
+                # agrees with the series it points into
+                self.search_index.pushed(dot_key, value, tokens[index] if tokens else None)
+                for observer in self.observers:
+                    observer.pushed(dot_key, value)
+                self._account_index(dot_key)
+                if retention is not None:
+                    self._drop_oldest(dot_key, retention.excess(series, self._sizes[dot_key]))
+                if self.memory_budget and self.total_size > self.memory_budget:
+                    self._enforce_budget()
+
+    def _account(self, dot_key, added):
+        """Update the size of a series after `added` bytes of values were
+        appended (or removed, if negative). Compressed series measure
+        themselves instead."""
+        series = self._series[dot_key]
+        old_size = self._sizes.get(dot_key, 0)
+        if isinstance(series, CompressedSeries):
+            self._sizes[dot_key] = series.nbytes
+        else:
+            self._sizes[dot_key] = old_size + added
+        self.total_size += self._sizes[dot_key] - old_size
+
+    def _account_index(self, dot_key):
+        """Update total_size for the search index after lines of dot_key
+        were indexed or dropped from it."""
+        old_size = self._index_sizes.get(dot_key, 0)
+        self._index_sizes[dot_key] = self.search_index.nbytes(dot_key)
+        vocabulary_size = self.search_index.vocabulary_nbytes
+        self.total_size += (self._index_sizes[dot_key] - old_size
+                            + vocabulary_size - self._vocabulary_size)
+        self._vocabulary_size = vocabulary_size
+
+    def _drop_oldest(self, dot_key, count):
+        if not count:
+            return
+        series = self._series[dot_key]
+        evicted = series[:count]
+        del series[:count]
+        self._account(dot_key, -1 * sum(map(value_size, evicted)))
+        self.search_index.evicted(dot_key, evicted)
+        for observer in self.observers:
+            observer.evicted(dot_key, evicted)
+        self._account_index(dot_key)
+
+    def _oldest_entry(self, dot_key):
+        series = self._series[dot_key]
+        retention = self._retention.get(dot_key)
+        oldest = series[0].get('time') if isinstance(series[0], dict) else None
+        return (retention.priority if retention else 0, oldest or datetime.min, dot_key)
+
+    def _enforce_budget(self):
+        """Drop the oldest values of the lowest priority series until the
+        total size is back under BUDGET_LOW_WATER of memory_budget."""
+        heap = [self._oldest_entry(dot_key)
+                for dot_key, series in self._series.items() if len(series) > 1]
+        heapq.heapify(heap)
+        target = self.memory_budget * BUDGET_LOW_WATER
+        while heap and self.total_size > target:
+            dot_key = heapq.heappop(heap)[2]
+            self._drop_oldest(dot_key, 1)
+            if len(self._series[dot_key]) > 1:
+                heapq.heappush(heap, self._oldest_entry(dot_key))
+
+    def series_usage(self):
+        """Lines and estimated bytes held by each pushed series, and by
+        the search index for it. The index's vocabulary is shared, so it is
+        split between the series in proportion to their postings."""
+        with self.lock:
+            indexed = sum(self._index_sizes.values()) or 1
+            return [{'key': dot_key, 'lines': len(series), 'bytes': self._sizes[dot_key],
+                     'index_bytes': (self._index_sizes.get(dot_key, 0)
+                                     + self._vocabulary_size * self._index_sizes.get(dot_key, 0) // indexed),
+                     'priority': self._retention[dot_key].priority if dot_key in self._retention else 0}
+                    for dot_key, series in sorted(self._series.items())]
+
+    def get_since(self, dot_key, since=0, limit=None):
+        """Return (count, items) where count is the number of values ever
+        pushed to dot_key and items are those pushed after the first `since`
+        that are still retained, or the newest `limit` of them. Used to ship
+        deltas to attached clients."""
+        with self.lock:
+            count = self._counts.get(dot_key, 0)
+            series = self._deep_get(dot_key)
+            if series is SENTINEL or count <= since:
+                return count, []
+            wanted = min(count - since, len(series), limit or len(series))
+            if not isinstance(series, CompressedSeries):
+                return count, series[-1 * wanted:]
+            read = series.reader(len(series) - wanted, len(series))
+        # compressed lines are decoded without the lock, so the collectors
+        # are not held up
+        return count, read()
+
+    def firing_alerts(self):
+        return self.alerts.firing_alerts()
+
+    def search(self, query, dot_keys=None):
+        with self.lock:
+            return self.search_index.search(query, dot_keys)
+
+    def find_lines(self, query, dot_keys=None, since=None):
+        with self.lock:
+            return self.search_index.find(query, dot_keys, since)
+
+    def resolve_lines(self, matches):
+        with self.lock:
+            return self.search_index.resolve(matches)
+
+    def hottest_namespaces(self, metric='total', count=10, nodes=None):
+        return self.hotspots.hottest(metric, count, nodes)
+
+    def node_statuses(self):
+        """Summarize collector thread health for each node."""
+        statuses = []
+        now = time.time()
+        # one pass under the lock rather than a get per thread, which would
+        # contend with every collector thread on a large fleet
+        with self.lock:
+            latest = self._dict.get('latest', {})
+            for listener in self.listeners:
+                total_threads, healthy_threads = 0, 0
+                node_latest = latest.get(listener.node_name, {})
+                for thread in listener.threads:
+                    total_threads += 1
+                    if thread.is_alive() and (now - int(node_latest.get(thread.collector.name, 0)) < 60
+                                              or thread.collector._infrequent):
+                        healthy_threads += 1
+                node = self._dict.get(listener.node_name, {})
+                statuses.append({'name': listener.node_name,
+                                 'primary': node.get('primary', False) if isinstance(node, dict) else False,
+                                 'total': total_threads, 'healthy': healthy_threads})
+        return statuses
 
     def _deep_get(self, dot_key, get_dict=None):
         if get_dict is None:
@@ -79,7 +297,7 @@ class ClusterData(object):
             set_dict[split[0]] = {}
         self._deep_set(split[1], value, set_dict[split[0]])
 
-    def _deep_append(self, dot_key, value, truncate_to, set_dict=None):
+    def _deep_append(self, dot_key, value, set_dict=None):
         if set_dict is None:
             set_dict = self._dict
         split = dot_key.split('.', 1)
@@ -87,12 +305,10 @@ class ClusterData(object):
             if split[0] not in set_dict:
                 set_dict[split[0]] = []
             set_dict[split[0]].append(value)
-            if truncate_to:
-                set_dict[split[0]] = set_dict[split[0]][-1 * truncate_to:]
-            return
+            return set_dict[split[0]]
         if split[0] not in set_dict:
             set_dict[split[0]] = {}
-        self._deep_append(split[1], value, truncate_to, set_dict[split[0]])
+        return self._deep_append(split[1], value, set_dict[split[0]])
 
     def start_polling(self):
         auth_kwargs = {}
@@ -101,6 +317,11 @@ class ClusterData(object):
         elif self.config['ssh']['auth_type'] == 'key':
             auth_kwargs['ssh_key_path'] = os.path.expanduser(self.config['ssh']['key_path'])
 
+        if self.workers:
+            from .workers import WorkerPool
+            WorkerPool(self, self.workers).start()
+            return
+
         for node in self.nodes:
             listener = NodeListenerController(self, node.get('name'), node.get('host'),
                                               node.get('mongo_port', 27017))
@@ -108,6 +329,26 @@ class ClusterData(object):
             listener.start_identify_thread()
             listener.start_threads()
 
+class LineReader(object):
+    """Splits the output of a remote command into lines as it arrives,
+    holding on to a line until its end has arrived too."""
+    def __init__(self, channel):
+        self.channel = channel
+        self.partial = b''
+
+    def read(self):
+        """Wait until more output arrives and return the lines it completes,
+        or None once the output has ended."""
+        output = self.channel.recv(READ_SIZE)
+        if not output:
+            if not self.partial:
+                return None
+            line, self.partial = self.partial, b''
+            return [line.decode('utf-8', 'replace')]
+        lines = (self.partial + output).split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode('utf-8', 'replace') + '\n' for line in lines]
+
 class NodeListenerController(object):
     def __init__(self, data, node_name, node_address, mongo_port=27017):
         self.data = data
@@ -143,17 +384,24 @@ class NodeListenerThread(threading.Thread):
         self.ssh_auth_type = self.data.config.get('ssh').get('auth_type')
         self.ssh_password = self.data.ssh_password
         self.ssh_key_path = os.path.expanduser(self.data.config.get('ssh').get('key_path'))
-        self.ssh = paramiko.SSHClient()
+        self.ssh = self.data.ssh_client_factory()
 
     def run(self):
         self.connect()
         try:
             stdin, stdout, stderr = self.ssh.exec_command(self.collector.command)
+            reader = LineReader(stdout.channel)
             while True:
-                self.collector.process(stdout.readlines(sizehint=1024))
+                # whatever has arrived is processed straight away, so slow
+                # streams are not held back waiting for a full read
+                lines = reader.read()
+                if lines is None:
+                    break
+                if not lines:
+                    continue
+                self.collector.process(lines)
                 self.data.set('latest.{}.{}'.format(self.node_name, self.collector.name),
                               time.time())
-                time.sleep(1)
         finally:
             self.ssh.close()
 
@@ -162,7 +410,12 @@ class NodeListenerThread(threading.Thread):
         if self.ssh_password:
             auth_kwargs['password'] = self.ssh_password
         if self.ssh_key_path:
-            auth_kwargs['key_filename'] = self.ssh_key_path
+            ssh_key = self.data.ssh_key(self.ssh_key_path)
+            if ssh_key is not None:
+                auth_kwargs['pkey'] = ssh_key
+            else:
+                auth_kwargs['key_filename'] = self.ssh_key_path
+        import paramiko
         self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self.ssh.connect(self.node_address, username=self.ssh_user,
                          **auth_kwargs)
@@ -179,7 +432,7 @@ class NodeIdentifierThread(NodeListenerThread):
         self.ssh_auth_type = self.data.config.get('ssh').get('auth_type')
         self.ssh_password = self.data.ssh_password
         self.ssh_key_path = os.path.expanduser(self.data.config.get('ssh').get('key_path'))
-        self.ssh = paramiko.SSHClient()
+        self.ssh = self.data.ssh_client_factory()
 
     def run(self):
         self.connect()
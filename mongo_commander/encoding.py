@@ -0,0 +1,271 @@
+"""Compact storage for long series of log and stat lines. A
+CompressedSeries behaves like the list ClusterData normally keeps, but
+only its newest lines are held as datums. Older lines are packed into
+fixed-size blocks: word tokens without digits are replaced by codes from
+a per-series dictionary, times are stored as deltas and each block is then
+compressed with zlib, or LZ4 if it is installed and asked for."""
+
+import re
+import sys
+import json
+import zlib
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+from .retention import value_size
+
+if sys.version_info[0] < 3:
+    chr = unichr
+
+HOT_LINES = 200  # newest lines kept as plain datums
+BLOCK_LINES = 256  # lines per compressed block
+CACHED_BLOCKS = 8  # decoded blocks kept for repeated reads
+DICTIONARY_BASE = 0xE000  # tokens are coded as unicode private use characters
+DICTIONARY_SIZE = 0xF8FF - DICTIONARY_BASE
+DICTIONARY_START = chr(DICTIONARY_BASE)
+ESCAPE = chr(0xF8FF)  # marks a literal token that starts with a private use character
+RECORD = u'\x00'  # separates the lines of a block
+DATUM_KEYS = frozenset(['data', 'time', 'node_name', 'collector_name', 'collector_type'])
+EPOCH = datetime(1970, 1, 1)
+_DIGIT = re.compile(r'[0-9]')
+
+def _codecs():
+    codecs = {'zlib': (lambda raw: zlib.compress(raw, 6), zlib.decompress)}
+    if lz4 is not None:
+        codecs['lz4'] = (lz4.compress, lz4.decompress)
+    return codecs
+
+CODECS = _codecs()
+
+def resolve_codec(name):
+    """Map a `compress` setting to a codec name: true picks LZ4 when it is
+    installed and zlib otherwise."""
+    if name is True:
+        return 'lz4' if 'lz4' in CODECS else 'zlib'
+    if name not in CODECS:
+        raise ValueError('unknown or unavailable compression {}'.format(name))
+    return name
+
+def _text(value):
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+
+def _encodable(data):
+    """Whether data comes back unchanged from a block: text without a
+    RECORD, or on Python 2 a str of such text, which decodes equal."""
+    text = _text(data)
+    return isinstance(data, (bytes, type(u''))) and text == data and RECORD not in text
+
+def _micros(moment):
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+class _Block(object):
+    __slots__ = ('payload', 'plain')
+
+    def __init__(self, payload=None, plain=None):
+        self.payload = payload
+        self.plain = plain
+
+    @property
+    def nbytes(self):
+        if self.plain is not None:
+            return sum(map(value_size, self.plain))
+        return len(self.payload)
+
+class CompressedSeries(object):
+    """List-like series of datums. Supports what ClusterData and the views
+    use: len, indexing, slicing, iteration, append and deleting from the
+    front."""
+    def __init__(self, codec='zlib', hot_lines=HOT_LINES, block_lines=BLOCK_LINES):
+        self.codec = resolve_codec(codec)
+        self.compress, self.decompress = CODECS[self.codec]
+        self.hot_lines = hot_lines
+        self.block_lines = block_lines
+        self.lock = threading.RLock()
+        self.hot = []
+        self.blocks = []
+        self.skip = 0  # lines already dropped from the first block
+        self.first_block = 0  # number of the first block, for the decode cache
+        self.codes = {}
+        self.tokens = []
+        self.dictionary_bytes = 0
+        self.cold_bytes = 0
+        self.hot_bytes = 0
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self.blocks) * self.block_lines - self.skip + len(self.hot)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __add__(self, other):
+        return self[:] + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self[:]
+
+    @property
+    def nbytes(self):
+        return self.hot_bytes + self.cold_bytes + self.dictionary_bytes
+
+    def append(self, datum):
+        with self.lock:
+            self.hot.append(datum)
+            self.hot_bytes += value_size(datum)
+            if len(self.hot) >= self.hot_lines + self.block_lines:
+                self._freeze(self.hot[:self.block_lines])
+                for frozen in self.hot[:self.block_lines]:
+                    self.hot_bytes -= value_size(frozen)
+                del self.hot[:self.block_lines]
+
+    def __getitem__(self, index):
+        with self.lock:
+            length = len(self)
+            if isinstance(index, slice):
+                start, stop, step = index.indices(length)
+                items = self._range(start, max(start, stop))
+                return items if step == 1 else items[::step]
+            if index < 0:
+                index += length
+            if not 0 <= index < length:
+                raise IndexError('series index out of range')
+            return self._range(index, index + 1)[0]
+
+    def __delitem__(self, index):
+        if not isinstance(index, slice) or index.start not in (None, 0) or index.step not in (None, 1):
+            raise TypeError('only deleting from the front of a series is supported')
+        with self.lock:
+            count = min(index.indices(len(self))[1], len(self))
+            cold = len(self.blocks) * self.block_lines - self.skip
+            self.skip += min(count, cold)
+            while self.blocks and self.skip >= self.block_lines:
+                self.cold_bytes -= self.blocks.pop(0).nbytes
+                self._cache.pop(self.first_block, None)
+                self.first_block += 1
+                self.skip -= self.block_lines
+            if count > cold:
+                for dropped in self.hot[:count - cold]:
+                    self.hot_bytes -= value_size(dropped)
+                del self.hot[:count - cold]
+
+    def _range(self, start, stop):
+        items = []
+        position = start + self.skip
+        cold_end = len(self.blocks) * self.block_lines
+        while position < min(stop + self.skip, cold_end):
+            number, offset = divmod(position, self.block_lines)
+            block = self._decoded(number)
+            taken = block[offset:offset + stop + self.skip - position]
+            items.extend(taken)
+            position += len(taken)
+        if stop + self.skip > cold_end:
+            items.extend(self.hot[max(0, start + self.skip - cold_end):stop + self.skip - cold_end])
+        return items
+
+    def reader(self, start, stop):
+        """Return a function reading lines start to stop as they are now.
+        Only the blocks they are in are looked up here; they are decoded
+        when the function is called, which needs no lock, so a long read
+        does not hold up appends."""
+        with self.lock:
+            start, stop, _ = slice(start, stop).indices(len(self))
+            stop = max(start, stop)
+            position = start + self.skip
+            cold_end = len(self.blocks) * self.block_lines
+            pieces = []
+            while position < min(stop + self.skip, cold_end):
+                number, offset = divmod(position, self.block_lines)
+                taken = min(self.block_lines - offset, stop + self.skip - position)
+                pieces.append((self.blocks[number], offset, offset + taken))
+                position += taken
+            hot = self.hot[max(0, start + self.skip - cold_end):max(0, stop + self.skip - cold_end)]
+
+        def read():
+            items = []
+            for block, begin, end in pieces:
+                decoded = block.plain if block.plain is not None else self.decode_block(block.payload)
+                items.extend(decoded[begin:end])
+            return items + hot
+        return read
+
+    def _decoded(self, number):
+        block = self.blocks[number]
+        if block.plain is not None:
+            return block.plain
+        key = self.first_block + number
+        if key in self._cache:
+            return self._cache[key]
+        decoded = self.decode_block(block.payload)
+        self._cache[key] = decoded
+        if len(self._cache) > CACHED_BLOCKS:
+            self._cache.popitem(last=False)
+        return decoded
+
+    def _freeze(self, datums):
+        fields = set((datum.get('node_name'), datum.get('collector_name'), datum.get('collector_type'))
+                     for datum in datums if isinstance(datum, dict))
+        if len(fields) != 1 or not all(isinstance(datum, dict) and set(datum) == DATUM_KEYS
+                                       and isinstance(datum['time'], datetime)
+                                       and datum['time'].tzinfo is None
+                                       and _encodable(datum['data'])
+                                       for datum in datums):
+            block = _Block(plain=list(datums))
+        else:
+            block = _Block(payload=self.encode_block(datums, fields.pop()))
+        self.blocks.append(block)
+        self.cold_bytes += block.nbytes
+
+    def _code(self, token):
+        code = self.codes.get(token)
+        if code is not None:
+            return code
+        if DICTIONARY_START <= token[:1] <= ESCAPE:
+            return ESCAPE + token
+        if len(self.tokens) >= DICTIONARY_SIZE or len(token) < 2 or _DIGIT.search(token):
+            return token
+        code = chr(DICTIONARY_BASE + len(self.tokens))
+        self.codes[token] = code
+        self.tokens.append(token)
+        self.dictionary_bytes += sys.getsizeof(token) * 2
+        return code
+
+    def encode_block(self, datums, fields):
+        times = [_micros(datum['time']) for datum in datums]
+        deltas = [times[0]] + [after - before for before, after in zip(times, times[1:])]
+        code = self.codes.get
+        lines = [u' '.join([token and (code(token) or self._code(token)) for token in _text(datum['data']).split(u' ')])
+                 for datum in datums]
+        header = json.dumps([list(fields), deltas], separators=(',', ':'))
+        return self.compress(RECORD.join([header] + lines).encode('utf-8'))
+
+    def _decode_token(self, token):
+        if not token:
+            return token
+        first = token[0]
+        if first == ESCAPE:
+            return token[1:]
+        if DICTIONARY_START <= first < ESCAPE and len(token) == 1:
+            return self.tokens[ord(first) - DICTIONARY_BASE]
+        return token
+
+    def decode_block(self, payload):
+        records = self.decompress(payload).decode('utf-8').split(RECORD)
+        fields, deltas = json.loads(records[0])
+        node_name, collector_name, collector_type = fields
+        moment = 0
+        datums = []
+        for delta, line in zip(deltas, records[1:]):
+            moment += delta
+            datums.append({'data': u' '.join(map(self._decode_token, line.split(u' '))),
+                           'time': EPOCH + timedelta(microseconds=moment),
+                           'node_name': node_name,
+                           'collector_name': collector_name,
+                           'collector_type': collector_type})
+        return datums
@@ -0,0 +1,147 @@
+"""Where the cluster's lock time goes, from mongotop. Each node's latest
+read, write and total time per namespace is kept as mongotop lines are
+pushed into ClusterData, along with the sum of each across all nodes.
+
+A line only updates the sums it changes, and the hottest namespaces are
+kept in a heap per metric instead of being sorted on every frame. Changing
+a score pushes a new heap entry; entries left behind with an old score are
+dropped as they surface.
+
+Collection workers track their own nodes and ship each namespace's changed
+times, which the UI process's NamespaceTop applies to its sums."""
+
+import heapq
+import threading
+
+from .parsers import ColumnParser, parse_number
+
+METRICS = ('total', 'read', 'write')
+_ZERO = (0.0, 0.0, 0.0)
+
+class TopK(object):
+    """Scores by key, able to return the highest few without sorting."""
+    def __init__(self):
+        self.scores = {}
+        self.heap = []  # (-score, key), including entries for old scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, key, delta):
+        self.set(key, self.scores.get(key, 0) + delta)
+
+    def set(self, key, score):
+        if score > 0:
+            self.scores[key] = score
+            heapq.heappush(self.heap, (-score, key))
+        else:
+            self.scores.pop(key, None)
+        if len(self.heap) > 2 * len(self.scores) + 64:
+            self.heap = [(-score, key) for key, score in self.scores.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, count):
+        """The count highest (key, score) pairs, highest first."""
+        found, seen = [], set()
+        while self.heap and len(found) < count:
+            entry = heapq.heappop(self.heap)
+            score, key = -entry[0], entry[1]
+            if key in seen or self.scores.get(key) != score:
+                continue
+            seen.add(key)
+            found.append(entry)
+        for entry in found:
+            heapq.heappush(self.heap, entry)
+        return [(key, -score) for score, key in found]
+
+class NamespaceTop(object):
+    """Observer of ClusterData tracking mongotop output by node and
+    namespace."""
+    def __init__(self, collector_names):
+        self.collector_names = set(collector_names)
+        self.lock = threading.RLock()
+        self.parsers = {}  # dot_key -> ColumnParser
+        self.current = {}  # node -> namespace -> (total, read, write)
+        self.reported = {}  # node -> namespaces reported since the last header
+        self.tops = dict((metric, TopK()) for metric in METRICS)
+        self.changes = None  # (node, namespace) -> newest times, once recording
+
+    def record_changes(self):
+        """Keep the times that change from now on for take_changes."""
+        with self.lock:
+            self.changes = {}
+
+    def take_changes(self):
+        """(node, namespace, times) for each time changed since the last
+        call, for apply on a NamespaceTop in another process."""
+        with self.lock:
+            changes, self.changes = self.changes, {}
+        return [(node, namespace, values) for (node, namespace), values in changes.items()]
+
+    def apply(self, changes):
+        with self.lock:
+            for node, namespace, values in changes:
+                self._update(node, namespace, values)
+
+    def pushed(self, dot_key, datum):
+        if not isinstance(datum, dict) or datum.get('collector_name') not in self.collector_names:
+            return
+        with self.lock:
+            parser = self.parsers.get(dot_key)
+            if parser is None:
+                parser = self.parsers[dot_key] = ColumnParser()
+            node = datum['node_name']
+            columns = parser.columns
+            fields = parser.parse(str(datum['data']))
+            if fields is None:
+                if parser.columns is not columns:
+                    # a header starts each tick, so whatever the last tick
+                    # did not report has gone quiet
+                    self._end_tick(node)
+                    self.reported[node] = set()
+                return
+            namespace = fields.get('ns')
+            values = tuple(parse_number(fields.get(metric, '')) for metric in METRICS)
+            if not namespace or None in values:
+                return
+            self.reported.setdefault(node, set()).add(namespace)
+            self._update(node, namespace, values)
+
+    def evicted(self, dot_key, datums):
+        pass
+
+    def _end_tick(self, node):
+        reported = self.reported.pop(node, None)
+        if reported is None:
+            return
+        for namespace in [namespace for namespace in self.current.get(node, {})
+                          if namespace not in reported]:
+            self._update(node, namespace, _ZERO)
+
+    def _update(self, node, namespace, values):
+        node_values = self.current.setdefault(node, {})
+        old = node_values.get(namespace, _ZERO)
+        if values == old:
+            return
+        if self.changes is not None:
+            self.changes[(node, namespace)] = values
+        if any(values):
+            node_values[namespace] = values
+        else:
+            del node_values[namespace]
+        for index, metric in enumerate(METRICS):
+            if values[index] != old[index]:
+                self.tops[metric].add(namespace, values[index] - old[index])
+
+    def hottest(self, metric='total', count=10, nodes=None):
+        """The count namespaces with the most `metric` time summed over the
+        cluster, hottest first, with that time on each of `nodes` (all
+        nodes by default)."""
+        index = METRICS.index(metric)
+        with self.lock:
+            if nodes is None:
+                nodes = list(self.current)
+            return [{'namespace': namespace, 'value': value,
+                     'nodes': dict((node, self.current.get(node, {}).get(namespace, _ZERO)[index])
+                                   for node in nodes)}
+                    for namespace, value in self.tops[metric].top(count)]
@@ -109,8 +109,10 @@ class MongoTopMenu(Menu):
     def __init__(self, collector_name):
         super(MongoTopMenu, self).__init__()
         self.heading = collector_name
-        self.options = [OptionGroup('view_mode', [c.TEXT, c.BAR_CHART, c.LINE_CHART])]
-        self.toggle_option('view_mode', c.TEXT)
+        self.options = [OptionGroup('view_mode', [c.HEATMAP, c.TEXT, c.BAR_CHART, c.LINE_CHART]),
+                        OptionGroup('metric', ['total', 'read', 'write'])]
+        self.toggle_option('view_mode', c.HEATMAP)
+        self.toggle_option('metric', 'total')
 
 class MongoStatMenu(Menu):
     def __init__(self, collector_name):
@@ -129,3 +131,9 @@ class TailGrepMenu(Menu):
         super(TailGrepMenu, self).__init__()
         self.heading = collector_name
         self.options = []
+
+class DiagnosticsMenu(Menu):
+    def __init__(self):
+        super(DiagnosticsMenu, self).__init__()
+        self.heading = "Diagnostics"
+        self.options = []
@@ -0,0 +1,58 @@
+"""Helpers for pulling fields out of the tabular output of mongostat and
+mongotop. Both tools right-align each value under its column heading, so
+a value is matched to the heading that ends nearest to where it ends."""
+
+import re
+
+_TOKEN = re.compile(r'\S+')
+_NUMBER = re.compile(r'^\*?(-?[0-9]*\.?[0-9]+)([a-zA-Z%]*)$')
+_MULTIPLIERS = {'': 1, '%': 1, 'ms': 1, 'b': 1,
+                'k': 1e3, 'm': 1e6, 'g': 1e9, 't': 1e12}
+
+def parse_number(raw):
+    """Turn a value like "12", "*0", "1.5g", "35ms" or "0.1%" into a float.
+    Returns None if the value is not numeric."""
+    match = _NUMBER.match(str(raw).strip())
+    if not match:
+        return None
+    multiplier = _MULTIPLIERS.get(match.group(2).lower())
+    if multiplier is None:
+        return None
+    return float(match.group(1)) * multiplier
+
+def _tokens(line):
+    return [(match.end(), match.group()) for match in _TOKEN.finditer(line.expandtabs())]
+
+class ColumnParser(object):
+    """Stateful parser for one stream of mongostat or mongotop output. Header
+    lines update the known columns; data lines are returned as a dict of
+    column name to raw value. Combined columns such as "qr|qw" are also split
+    into their parts."""
+    def __init__(self):
+        self.columns = None
+        self._names_by_end = {}
+
+    @staticmethod
+    def is_header(tokens):
+        numeric = len([token for _, token in tokens if re.search(r'[0-9]', token)])
+        return numeric * 2 < len(tokens)
+
+    def parse(self, line):
+        tokens = _tokens(line)
+        if not tokens:
+            return None
+        if self.is_header(tokens):
+            self.columns = tokens
+            self._names_by_end = dict(tokens)
+            return None
+        if self.columns is None:
+            return None
+        fields = {}
+        for end, value in tokens:
+            name = self._names_by_end.get(end)
+            if name is None:
+                name = min(self.columns, key=lambda column: abs(column[0] - end))[1]
+            fields[name] = value
+            if '|' in name and '|' in value:
+                fields.update(zip(name.split('|'), value.split('|')))
+        return fields
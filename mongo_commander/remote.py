@@ -0,0 +1,233 @@
+"""Lets a single collector process be shared by several UIs. The daemon
+side wraps a polling ClusterData in a CollectorServer; clients use a
+RemoteClusterData, which subscribes to the keys its views read and pulls
+only the values pushed since its last sync instead of full snapshots.
+Clients hold the newest SYNC_LINES of each series; searches over the rest
+go to the server."""
+
+import json
+import time
+import socket
+import logging
+import threading
+import calendar
+from datetime import datetime
+
+try:
+    import SocketServer as socketserver
+except ImportError:
+    import socketserver
+
+from .data import ClusterData, SENTINEL
+from .encoding import CompressedSeries
+
+SYNC_INTERVAL = 1  # seconds between client sync requests
+SUBSCRIPTION_TTL = 10  # seconds a key stays subscribed after its last read
+SYNC_LINES = 1000  # newest lines of a series clients hold, more than a view draws
+LOCAL_KEYS = ('prompt',)  # set by the client's own views, never synced
+
+def parse_address(address, default_host='localhost'):
+    """Split a "[HOST:]PORT" string into a (host, port) tuple."""
+    host, _, port = str(address).rpartition(':')
+    return (host or default_host, int(port))
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'$time': calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6}
+    if isinstance(value, dict):
+        return dict((key, _encode(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+def _decode(value):
+    if isinstance(value, dict):
+        if '$time' in value:
+            return datetime.utcfromtimestamp(value['$time'])
+        return dict((key, _decode(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+def _write_message(stream, message):
+    stream.write((json.dumps(_encode(message)) + '\n').encode('utf-8'))
+    stream.flush()
+
+def _read_message(stream):
+    line = stream.readline()
+    if not line:
+        raise EOFError('connection closed')
+    return _decode(json.loads(line.decode('utf-8')))
+
+class _CollectorRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        data = self.server.data
+        while True:
+            try:
+                request = _read_message(self.rfile)
+            except EOFError:
+                return
+            if request.get('op') == 'config':
+                response = {'config': dict((key, value)
+                                           for key, value in data.config.items()
+                                           if key != 'ssh')}
+            elif request.get('op') == 'sync':
+                response = {'values': self._sync(data, request.get('keys', {})),
+                            'nodes': data.node_statuses(),
+                            'alerts': data.firing_alerts()}
+            elif request.get('op') == 'usage':
+                response = {'usage': data.series_usage()}
+            elif request.get('op') == 'search':
+                response = {'matches': data.search(request['query'], request.get('keys'))}
+            elif request.get('op') == 'find':
+                response = data.find_lines(request['query'], request.get('keys'), request.get('since'))
+            elif request.get('op') == 'resolve':
+                response = {'datums': data.resolve_lines(request['matches'])}
+            elif request.get('op') == 'hotspots':
+                response = {'hottest': data.hottest_namespaces(request.get('metric', 'total'),
+                                                               request.get('count', 10),
+                                                               request.get('nodes'))}
+            else:
+                response = {'error': 'unknown op {}'.format(request.get('op'))}
+            _write_message(self.wfile, response)
+
+    def _sync(self, data, keys):
+        values = {}
+        for dot_key, since in keys.items():
+            with data.lock:
+                value = data._deep_get(dot_key)
+                if value is SENTINEL:
+                    # not collected yet, or a key only the client sets
+                    continue
+                if not isinstance(value, (list, CompressedSeries)):
+                    values[dot_key] = {'value': value}
+                    continue
+                length = min(len(value), SYNC_LINES)
+            count, items = data.get_since(dot_key, since or 0, SYNC_LINES)
+            values[dot_key] = {'count': count, 'items': items, 'length': length,
+                               'reset': since is None or count - (since or 0) > len(items)}
+        return values
+
+class CollectorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Serves a polling ClusterData to any number of attached clients."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, data, address):
+        socketserver.TCPServer.__init__(self, address, _CollectorRequestHandler)
+        self.data = data
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+class RemoteClusterData(ClusterData):
+    """ClusterData mirror fed by a CollectorServer. Any key read through get
+    is subscribed for SUBSCRIPTION_TTL seconds, so only the series the
+    current views need are transferred."""
+    def __init__(self, address):
+        self.address = address
+        self.connection = None
+        self.stream = None
+        self.request_lock = threading.Lock()
+        self._subscriptions = {}
+        self._since = {}
+        self._node_statuses = []
+        self._firing_alerts = []
+        super(RemoteClusterData, self).__init__(None)
+
+    def load_config(self):
+        self.config = self._request({'op': 'config'})['config']
+        self.ssh_password = None
+
+    def get(self, dot_key, default=SENTINEL):
+        if dot_key in LOCAL_KEYS:
+            return super(RemoteClusterData, self).get(dot_key, default)
+        with self.lock:
+            self._subscriptions[dot_key] = time.time()
+        return super(RemoteClusterData, self).get(dot_key, default)
+
+    def node_statuses(self):
+        return self._node_statuses
+
+    def firing_alerts(self):
+        return self._firing_alerts
+
+    def search(self, query, dot_keys=None):
+        return self._request({'op': 'search', 'query': query,
+                              'keys': list(dot_keys) if dot_keys is not None else None})['matches']
+
+    def find_lines(self, query, dot_keys=None, since=None):
+        return self._request({'op': 'find', 'query': query, 'since': since,
+                              'keys': list(dot_keys) if dot_keys is not None else None})
+
+    def resolve_lines(self, matches):
+        return self._request({'op': 'resolve', 'matches': matches})['datums']
+
+    def series_usage(self):
+        return self._request({'op': 'usage'})['usage']
+
+    def hottest_namespaces(self, metric='total', count=10, nodes=None):
+        return self._request({'op': 'hotspots', 'metric': metric, 'count': count,
+                              'nodes': list(nodes) if nodes is not None else None})['hottest']
+
+    def start_polling(self):
+        thread = threading.Thread(target=self._sync_forever)
+        thread.daemon = True
+        thread.start()
+
+    def _connect(self):
+        self.connection = socket.create_connection(self.address)
+        self.stream = self.connection.makefile('rwb')
+
+    def _disconnect(self):
+        for closeable in (self.stream, self.connection):
+            try:
+                closeable.close()
+            except Exception:
+                pass
+        self.connection, self.stream = None, None
+
+    def _request(self, message):
+        with self.request_lock:
+            if self.connection is None:
+                self._connect()
+            try:
+                _write_message(self.stream, message)
+                return _read_message(self.stream)
+            except (socket.error, EOFError, ValueError):
+                self._disconnect()
+                raise
+
+    def _sync_forever(self):
+        while True:
+            try:
+                self.sync()
+            except (socket.error, EOFError, ValueError):
+                logging.exception('Lost connection to collector at {}:{}'.format(*self.address))
+            time.sleep(SYNC_INTERVAL)
+
+    def sync(self):
+        now = time.time()
+        with self.lock:
+            for dot_key, last_read in list(self._subscriptions.items()):
+                if now - last_read > SUBSCRIPTION_TTL:
+                    del self._subscriptions[dot_key]
+                    self._since.pop(dot_key, None)
+            keys = dict((dot_key, self._since.get(dot_key))
+                        for dot_key in self._subscriptions)
+        response = self._request({'op': 'sync', 'keys': keys})
+        with self.lock:
+            for dot_key, update in response['values'].items():
+                if 'value' in update:
+                    self._deep_set(dot_key, update['value'])
+                    continue
+                series = [] if update['reset'] else self._deep_get(dot_key)
+                if series is SENTINEL:
+                    series = []
+                self._deep_set(dot_key, (series + update['items'])[-1 * update['length']:])
+                self._since[dot_key] = update['count']
+            self._node_statuses = response['nodes']
+            self._firing_alerts = response['alerts']
@@ -0,0 +1,86 @@
+"""How much of each series ClusterData keeps. Each collector can set a
+`retention` in the config limiting its series by line count, age and
+estimated size, plus a priority used when the global `memory_budget`
+forces data to be dropped across series."""
+
+import sys
+import math
+from datetime import datetime
+
+from .parsers import parse_number
+
+DEFAULT_LINES = 500
+
+# rough size of a datum besides its line: the dict and its datetime. the
+# name strings are shared between datums, so they are not counted.
+DATUM_OVERHEAD = (sys.getsizeof({'data': None, 'time': None, 'node_name': None,
+                                 'collector_name': None, 'collector_type': None})
+                  + sys.getsizeof(datetime.utcnow()))
+
+def value_size(value):
+    """Estimated bytes held by a value pushed to ClusterData."""
+    if isinstance(value, dict) and 'data' in value:
+        return DATUM_OVERHEAD + sys.getsizeof(value['data'])
+    return sys.getsizeof(value)
+
+def parse_bytes(raw):
+    """Accepts a byte count as a number or a string like "64m"."""
+    if raw is None:
+        return None
+    size = parse_number(raw)
+    if size is None:
+        raise ValueError('cannot parse size {}'.format(raw))
+    return int(size)
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1000:
+            return '{:.0f}{}'.format(size, unit)
+        size /= 1000.0
+    return '{:.1f}GB'.format(size)
+
+class Retention(object):
+    def __init__(self, lines=None, seconds=None, bytes=None, priority=0, compress=False):
+        if lines is None and seconds is None and bytes is None:
+            lines = DEFAULT_LINES
+        self.lines = lines
+        self.seconds = seconds
+        self.bytes = parse_bytes(bytes)
+        self.priority = priority
+        # False, True, or the name of the codec for a CompressedSeries
+        self.compress = compress
+
+    @classmethod
+    def from_doc(cls, collector_doc):
+        return cls(**collector_doc.get('retention', {}))
+
+    @classmethod
+    def coerce(cls, retention):
+        """Accept a Retention, a plain line count or None."""
+        if retention is None or isinstance(retention, cls):
+            return retention
+        return cls(lines=retention)
+
+    def excess(self, series, series_bytes):
+        """Return how many of the oldest values of series to drop. The
+        newest value is always kept."""
+        drop = 0
+        if self.lines and len(series) > self.lines:
+            drop = len(series) - self.lines
+        if self.seconds and isinstance(series[-1], dict) and 'time' in series[-1]:
+            newest = series[-1]['time']
+            while (drop < len(series) - 1
+                   and (newest - series[drop]['time']).total_seconds() > self.seconds):
+                drop += 1
+        if self.bytes and series_bytes > self.bytes:
+            if self.compress:
+                # compressed lines have no size of their own, so assume
+                # every line costs the same
+                line_size = float(series_bytes) / len(series)
+                drop = max(drop, int(math.ceil((series_bytes - self.bytes) / line_size)))
+            else:
+                remaining = series_bytes - sum(map(value_size, series[:drop]))
+                while drop < len(series) - 1 and remaining > self.bytes:
+                    remaining -= value_size(series[drop])
+                    drop += 1
+        return min(drop, len(series) - 1)
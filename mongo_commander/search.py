@@ -0,0 +1,335 @@
+"""In-memory search over the log lines held in ClusterData. The index is
+kept up to date as lines are pushed and evicted, so a search never has to
+scan every retained line.
+
+Lines are split into lowercase word tokens, each with postings of the
+lines containing it. Tokens are split at digits, so counts, ids and
+times, which would each be a token of their own, add no postings;
+queries are split the same way, and the digits are left to the final
+check. Query words may be partial, so the vocabulary of tokens also gets
+a trigram index used to find the tokens containing each query word.
+Candidate lines are then checked for the whole query.
+
+The index does not hold on to the lines themselves, which may be
+compressed in their series. A line is known by the number of its series
+and its push number within it, from which its position in the series
+follows. Postings are kept per span of a series' lines: single lines for
+a plain series, and the lines of each block for a CompressedSeries, so
+the index shrinks with the series and a search decodes each candidate
+block once. A token's postings for a series are a sorted list of span
+numbers, added at the back. A series evicts its oldest lines first, so
+evicting only moves the series' first line on; postings left behind are
+cut from the fronts of the lists every SWEEP_LINES evicted lines, and
+ignored until then. ClusterData updates the index under its own lock, so
+they always agree."""
+
+import re
+import sys
+import bisect
+import threading
+from collections import defaultdict, deque
+
+from .encoding import CompressedSeries
+
+_WORD = re.compile(r'\w+')
+_RUN = re.compile(r'[^\W\d]+')  # a word's parts between digits
+_HEX_ID = re.compile(r'[0-9a-f]*[0-9][0-9a-f]*$')  # numbers and hex ids
+_HEX_LETTERS = re.compile(r'[a-f]+$')
+SWEEP_LINES = 4096  # evicted lines between sweeps of postings left behind
+# estimated bytes held by the index, checked against tracemalloc
+SPAN_BYTES = 28  # the span number shared by a span's postings
+POSTING_BYTES = 9  # a span number's slot in a list
+SERIES_POSTINGS_BYTES = 140  # a token's list for one series
+TOKEN_BYTES = 330  # a token's postings dict
+TRIGRAM_BYTES = 90  # a token's place in the trigram index
+
+def tokenize(text):
+    """The tokens a line is indexed by: its words, split at digits.
+    Numbers and hex ids, such as ObjectIds, add none."""
+    tokens = set()
+    for word in _WORD.findall(text.lower()):
+        if word.isalpha():
+            tokens.add(word)
+        elif not _HEX_ID.match(word):
+            tokens.update(_RUN.findall(word))
+    return tokens
+
+def query_words(query):
+    """The tokens of query that can narrow a search down. Runs of the
+    letters a-f may be part of a hex id, which is not indexed, so they are
+    left to the final check."""
+    return [word for word in tokenize(query) if not _HEX_LETTERS.match(word)]
+
+def trigrams(token):
+    return set(token[index:index + 3] for index in range(len(token) - 2))
+
+class LogIndex(object):
+    def __init__(self, collector_names, lookup):
+        self.collector_names = set(collector_names)
+        self.lookup = lookup  # returns the series stored at a dot key
+        self.lock = threading.RLock()
+        self.keys = []  # series number -> dot_key
+        self.numbers = {}  # dot_key -> series number
+        self.spans = []  # series number -> lines per posting
+        self.first = []  # series number -> push number of its oldest indexed line
+        self.next = []  # series number -> push number of its next line
+        self.current = []  # series number -> span number of its next line
+        self.added = []  # series number -> postings added by each retained span
+        self.sizes = []  # series number -> estimated bytes of its postings
+        self.postings = {}  # token -> series number -> list of span numbers
+        self.vocabulary = defaultdict(set)  # trigram -> tokens
+        self.vocabulary_nbytes = 0
+        self.unswept = 0  # lines evicted since the last sweep
+
+    def __len__(self):
+        return sum(self.next) - sum(self.first)
+
+    def nbytes(self, dot_key):
+        """Estimated bytes held for the lines of dot_key."""
+        number = self.numbers.get(dot_key)
+        return 0 if number is None else int(self.sizes[number])
+
+    def position(self, dot_key, push):
+        """Where the line with push number push is in the series at
+        dot_key, or None if it is no longer retained."""
+        number = self.numbers.get(dot_key)
+        if number is None or not self.first[number] <= push < self.next[number]:
+            return None
+        return push - self.first[number]
+
+    def _register(self, dot_key):
+        series = self.lookup(dot_key)
+        self.numbers[dot_key] = len(self.keys)
+        self.keys.append(dot_key)
+        # blocks are cut from a CompressedSeries' first line on, so its
+        # spans line up with them
+        self.spans.append(series.block_lines if isinstance(series, CompressedSeries) else 1)
+        self.first.append(0)
+        self.next.append(0)
+        self.current.append(None)
+        self.added.append(deque())
+        self.sizes.append(0)
+        return self.numbers[dot_key]
+
+    def pushed(self, dot_key, datum, tokens=None):
+        """Index datum, the newest line of dot_key. tokens are those of
+        its line, if they were already found elsewhere."""
+        if not isinstance(datum, dict) or datum.get('collector_name') not in self.collector_names:
+            return
+        with self.lock:
+            number = self.numbers.get(dot_key)
+            if number is None:
+                number = self._register(dot_key)
+            span = self.next[number] // self.spans[number]
+            self.next[number] += 1
+            if span != self.current[number]:
+                # one object for the span, shared by all its postings
+                self.current[number] = span
+                self.added[number].append(0)
+                self.sizes[number] += SPAN_BYTES
+            span = self.current[number]
+            added = self.added[number]
+            if tokens is None:
+                tokens = tokenize(str(datum['data']))
+            for token in tokens:
+                by_series = self.postings.get(token)
+                if by_series is None:
+                    by_series = self.postings[token] = {}
+                    self._learn_token(token)
+                posting = by_series.get(number)
+                if posting is None:
+                    posting = by_series[number] = []
+                    self.sizes[number] += SERIES_POSTINGS_BYTES
+                if not posting or posting[-1] != span:
+                    posting.append(span)
+                    added[-1] += 1
+                    self.sizes[number] += POSTING_BYTES
+
+    def evicted(self, dot_key, datums):
+        number = self.numbers.get(dot_key)
+        if number is None:
+            return
+        with self.lock:
+            oldest = self._oldest_span(number)
+            self.first[number] += len(datums)
+            # the postings of spans now gone are counted as freed straight
+            # away, so the memory budget sees them go before the sweep
+            for _ in range(self._oldest_span(number) - oldest):
+                self.sizes[number] -= SPAN_BYTES + POSTING_BYTES * self.added[number].popleft()
+            self.unswept += len(datums)
+            if self.unswept >= SWEEP_LINES:
+                self.sweep()
+
+    def _oldest_span(self, number):
+        """Postings for spans before this one are left behind by evictions."""
+        return self.first[number] // self.spans[number]
+
+    def sweep(self):
+        """Drop the postings of spans whose lines have all been evicted."""
+        with self.lock:
+            for token, by_series in list(self.postings.items()):
+                for number, posting in list(by_series.items()):
+                    del posting[:bisect.bisect_left(posting, self._oldest_span(number))]
+                    if not posting:
+                        del by_series[number]
+                        self.sizes[number] -= SERIES_POSTINGS_BYTES
+                if not by_series:
+                    del self.postings[token]
+                    self._forget_token(token)
+            self.unswept = 0
+
+    def _learn_token(self, token):
+        grams = trigrams(token)
+        for trigram in grams:
+            self.vocabulary[trigram].add(token)
+        self.vocabulary_nbytes += sys.getsizeof(token) + TOKEN_BYTES + TRIGRAM_BYTES * len(grams)
+
+    def _forget_token(self, token):
+        grams = trigrams(token)
+        for trigram in grams:
+            tokens = self.vocabulary.get(trigram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self.vocabulary[trigram]
+        self.vocabulary_nbytes -= sys.getsizeof(token) + TOKEN_BYTES + TRIGRAM_BYTES * len(grams)
+
+    def _matching_tokens(self, word):
+        if len(word) < 3:
+            return [token for token in self.postings if word in token]
+        grams = sorted(trigrams(word), key=lambda gram: len(self.vocabulary.get(gram, ())))
+        candidates = self.vocabulary.get(grams[0], set())
+        return [token for token in candidates if word in token]
+
+    def _candidates(self, query, numbers):
+        """series number -> span numbers of the lines of those series that
+        may contain query, or None for all of them."""
+        words = sorted(query_words(query), key=len, reverse=True)
+        if not words:
+            return dict((number, None) for number in numbers)
+        if len(words[0]) >= 3:
+            # short words would need a scan of the whole vocabulary, so
+            # leave them to the final check when longer words narrow it down
+            words = [word for word in words if len(word) >= 3]
+        candidates = None
+        for word in words:
+            spans = defaultdict(set)
+            for token in self._matching_tokens(word):
+                for number, posting in self.postings[token].items():
+                    if number in numbers:
+                        spans[number].update(posting)
+            if candidates is not None:
+                spans = dict((number, candidates[number] & found)
+                             for number, found in spans.items() if number in candidates)
+            candidates = dict((number, found) for number, found in spans.items() if found)
+            if not candidates:
+                break
+        return candidates
+
+    def _runs(self, number, spans):
+        """The retained lines of the given spans, as (start, stop) push
+        numbers with adjacent spans merged. All of them if spans is None."""
+        first, end, size = self.first[number], self.next[number], self.spans[number]
+        if spans is None:
+            return [(first, end)] if first < end else []
+        runs = []
+        for span in sorted(spans):
+            start, stop = max(first, span * size), min(end, (span + 1) * size)
+            if start >= stop:
+                continue
+            if runs and runs[-1][1] == start:
+                runs[-1] = (runs[-1][0], stop)
+            else:
+                runs.append((start, stop))
+        return runs
+
+    def find(self, query, dot_keys=None, since=None):
+        """Locate the retained lines whose line contains query, ignoring
+        case, as a dict of `matches`, (time, dot_key, push number) tuples
+        oldest first, and the push numbers of the `first` retained and the
+        `next` line of each series. If dot_keys is given, only lines pushed
+        to those keys are found. since is the `next` of an earlier find:
+        only the lines pushed after it are checked, by reading them instead
+        of going through the index."""
+        query = query.lower()
+        with self.lock:
+            if dot_keys is None:
+                numbers = range(len(self.keys))
+            else:
+                numbers = [self.numbers[dot_key] for dot_key in dot_keys if dot_key in self.numbers]
+            if since is None:
+                found = self._candidates(query, set(numbers))
+                runs = [(number, start, stop) for number in sorted(found)
+                        for start, stop in self._runs(number, found[number])]
+            else:
+                runs = [(number, max(since.get(self.keys[number], 0), self.first[number]), self.next[number])
+                        for number in numbers]
+            matches = []
+            for number, start, stop in runs:
+                if start >= stop:
+                    continue
+                first, dot_key = self.first[number], self.keys[number]
+                # a run at a time, so each block is decoded once
+                lines = self.lookup(dot_key)[start - first:stop - first]
+                for push, datum in enumerate(lines, start):
+                    if query in str(datum['data']).lower():
+                        matches.append((datum['time'], dot_key, push))
+            return {'matches': sorted(matches),
+                    'first': dict((self.keys[number], self.first[number]) for number in numbers),
+                    'next': dict((self.keys[number], self.next[number]) for number in numbers)}
+
+    def resolve(self, matches):
+        """The datums of the matches from find still retained, in order."""
+        with self.lock:
+            datums = []
+            series, series_key = None, None
+            for _, dot_key, push in matches:
+                position = self.position(dot_key, push)
+                if position is None:
+                    continue
+                if dot_key != series_key:
+                    series, series_key = self.lookup(dot_key), dot_key
+                datums.append(series[position])
+            return datums
+
+    def search(self, query, dot_keys=None):
+        """Return the retained datums whose line contains query, ignoring
+        case, oldest first. If dot_keys is given, only lines pushed to
+        those keys are returned."""
+        with self.lock:
+            return self.resolve(self.find(query, dot_keys)['matches'])
+
+class SearchResults(object):
+    """The lines of dot_keys matching query, as a sequence a StreamWidget
+    can show. The whole index is searched once; after that update only
+    checks the lines pushed since. Only where each match is gets kept, so
+    slicing reads just the datums of the page being drawn."""
+    def __init__(self, data, query, dot_keys):
+        self.data = data
+        self.query = query
+        self.dot_keys = list(dot_keys)
+        self.matches = []
+        self.first = {}
+        self.next = None
+
+    def update(self):
+        found = self.data.find_lines(self.query, self.dot_keys, self.next)
+        new = found['matches']
+        if new:
+            ordered = not self.matches or tuple(new[0]) >= tuple(self.matches[-1])
+            self.matches.extend(new)
+            if not ordered:
+                # lines from other nodes can arrive out of time order
+                self.matches.sort()
+        if found['first'] != self.first:
+            first = self.first = found['first']
+            self.matches = [match for match in self.matches if match[2] >= first.get(match[1], 0)]
+        self.next = found['next']
+
+    def __len__(self):
+        return len(self.matches)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.data.resolve_lines(self.matches[index])
+        return self.data.resolve_lines([self.matches[index]])[0]
@@ -9,16 +9,28 @@ import logging
 from operator import itemgetter
 from collections import OrderedDict
 
-from .menus import MainMenu, MongoTopMenu, MongoStatMenu, TailMenu, TailGrepMenu
+from . import constants as c
+from .menus import MainMenu, MongoTopMenu, MongoStatMenu, TailMenu, TailGrepMenu, DiagnosticsMenu
+from .retention import format_bytes
 from .widgets import StreamWidget
-from .curses_util import movedown
+from .search import SearchResults
+from .curses_util import clamp_offset
 
 class View(object):
+    # if True, the WindowManager sends every key to this view alone
+    capturing_input = False
+
     def __init__(self, data, window):
         self.data = data
+        self.set_window(window)
+
+    def set_window(self, window):
+        """Draw to window from now on, e.g. after the terminal was resized."""
         self.window = window
 
     def process_char(self, char):
+        """Handle a key. The WindowManager renders every view after each
+        key, so this only changes what the next render draws."""
         pass
 
     def render(self):
@@ -28,17 +40,23 @@ class CollectorView(View):
     def __init__(self, data, window, collector_name):
         super(CollectorView, self).__init__(data, window)
         self.collector_name = collector_name
+
+    def set_window(self, window):
+        super(CollectorView, self).set_window(window)
         y, x = self.window.getmaxyx()
         self.subwindow = self.window.derwin(y - 4, x - 2, 3, 1)
 
+    @property
+    def title(self):
+        return self.collector_name
+
     def update_subwindow(self):
         raise NotImplementedError()
 
     def render(self):
         self.window.clear()
         self.window.border(0)
-        self.window.move(1, 1)
-        self.window.addstr(self.collector_name, curses.A_BOLD)
+        self.window.addstr(1, 1, self.title[:self.window.getmaxyx()[1] - 2], curses.A_BOLD)
         self.subwindow.clear()
         self.update_subwindow()
         self.subwindow.refresh()
@@ -66,7 +84,8 @@ class TitleView(View):
 
     def render(self):
         self.window.clear()
-        self.window.addstr(0, 1, 'Mongo Commander - {}'.format(self.get_motivational()), curses.A_BOLD)
+        y, x = self.window.getmaxyx()
+        self.window.addstr(0, 1, 'Mongo Commander - {}'.format(self.get_motivational())[:x - 2], curses.A_BOLD)
 
 class MiniView(View):
     def __init__(self, *args, **kwargs):
@@ -75,91 +94,225 @@ class MiniView(View):
     def render(self):
         self.window.clear()
         prompt = self.data.get('prompt', None)
+        alerts = self.data.firing_alerts()
+        y, x = self.window.getmaxyx()
         if prompt:
-            self.window.addstr(0, 1, prompt)
+            self.window.addstr(0, 1, prompt[-(x - 2):])
+        elif alerts:
+            summary = 'ALERT {} on {} (value {:g})'.format(alerts[-1]['name'],
+                                                            alerts[-1]['subject'],
+                                                            alerts[-1]['value'])
+            if len(alerts) > 1:
+                summary += ' and {} more'.format(len(alerts) - 1)
+            self.window.addstr(0, 1, summary[:x - 2], curses.color_pair(1) | curses.A_BOLD)
         else:
-            self.window.addstr(0, 1, 'Arrow keys to navigate menus, m for collector menu, ENTER to select, q to exit')
+            self.window.addstr(0, 1, 'Arrow keys to navigate menus, m for collector menu, ENTER to select, '
+                               '/ to search logs, [ and ] to scroll nodes, d for diagnostics, q to exit'[:x - 2])
 
 class MenuView(View):
     def __init__(self, window_manager, *args, **kwargs):
         super(MenuView, self).__init__(*args, **kwargs)
         self.window_manager = window_manager
         self.menu = MainMenu(self.data, self.window_manager)
+        self.offset = 0
 
-    def render(self):
-        self.window.clear()
-        self.window.border(0)
-        self.window.move(1, 1)
-        self.window.addstr(self.menu.heading.upper(), curses.A_BOLD)
-        self.window.move(3, 1)
-        position = 0
+    def menu_rows(self):
+        """The lines of the menu as (column, option group, option) with a
+        None option for group headings and None for blank lines, and the
+        line of the option at the cursor."""
+        rows, cursor, position = [], None, 0
         for option_group in self.menu.options:
-            self.window.addstr(option_group.name.upper().replace('_', ' '), curses.A_BOLD)
-            movedown(self.window, 2, 3)
+            rows.append((1, option_group, None))
+            rows.append(None)
             for option in option_group.options:
                 if self.menu.position == position:
-                    y, x = self.window.getyx()
-                    self.window.addstr(y, 1, "> ", curses.A_BOLD)
-                self.window.addstr(option['name'], curses.color_pair(4 if option['active'] else 3))
-                movedown(self.window, 1, 3)
+                    cursor = len(rows)
+                rows.append((3, option_group, option))
                 position += 1
-            movedown(self.window, 1, 1)
+            rows.append(None)
+        return rows, cursor
+
+    def render(self):
+        self.window.clear()
+        self.window.border(0)
+        y, x = self.window.getmaxyx()
+        self.window.addstr(1, 1, self.menu.heading.upper()[:x - 2], curses.A_BOLD)
+        rows, cursor = self.menu_rows()
+        height = y - 4
+        if cursor is not None:
+            # scroll just enough to keep the cursor on screen
+            self.offset = min(cursor, max(self.offset, cursor - height + 1))
+        self.offset = clamp_offset(self.offset, len(rows), height)
+        for line, row in enumerate(rows[self.offset:self.offset + height]):
+            if row is None:
+                continue
+            column, option_group, option = row
+            if option is None:
+                text, attributes = option_group.name.upper().replace('_', ' '), curses.A_BOLD
+            else:
+                text, attributes = option['name'], curses.color_pair(4 if option['active'] else 3)
+            if self.offset + line == cursor:
+                self.window.addstr(3 + line, 1, "> ", curses.A_BOLD)
+            self.window.addstr(3 + line, column, text[:x - 1 - column], attributes)
 
     def process_char(self, char):
         self.menu.process_char(char)
-        self.render()
 
 class StatusView(View):
+    """Health of every node and the firing alerts. Only the rows that fit
+    are drawn; [ and ] scroll through the rest."""
     def __init__(self, *args, **kwargs):
         super(StatusView, self).__init__(*args, **kwargs)
+        self.offset = 0
+
+    def process_char(self, char):
+        height = self.window.getmaxyx()[0] - 4
+        if char == '[':
+            self.offset = max(0, self.offset - height)
+        elif char == ']':
+            self.offset += height
+
+    def status_rows(self):
+        """The lines below the title as (format function, item), or None
+        for blank lines. Nothing is formatted until a line is drawn."""
+        nodes = self.get_nodes_status_for_render()
+        rows = [(self.format_heading, 'PRIMARIES'), None]
+        rows.extend((self.format_node, node) for node in sorted(nodes['primary'], key=itemgetter('name')))
+        rows.extend([None, (self.format_heading, 'SECONDARIES'), None])
+        rows.extend((self.format_node, node) for node in sorted(nodes['secondary'], key=itemgetter('name')))
+        alerts = self.data.firing_alerts()
+        if alerts:
+            rows.extend([None, (self.format_alert_heading, 'ALERTS'), None])
+            rows.extend((self.format_alert, alert) for alert in alerts)
+        return rows
+
+    def format_heading(self, heading):
+        return heading, curses.A_BOLD
+
+    def format_alert_heading(self, heading):
+        return heading, curses.A_BOLD | curses.color_pair(1)
+
+    def format_node(self, node):
+        return ("{}: {}/{}".format(node['name'], node['healthy'], node['total']),
+                curses.color_pair(2 if node['healthy'] == node['total'] else 1))
+
+    def format_alert(self, alert):
+        return "{}: {}".format(alert['name'], alert['subject']), curses.color_pair(1)
 
     def render(self):
         self.window.clear()
         self.window.border(0)
+        y, x = self.window.getmaxyx()
         self.window.addstr(1, 1, 'NODE STATUS', curses.A_BOLD)
-        self.window.addstr(3, 1, 'PRIMARIES', curses.A_BOLD)
-        self.window.move(5, 1)
-        nodes = self.get_nodes_status_for_render()
-        for node in sorted(nodes['primary'], key=itemgetter('name')):
-            self.window.addstr("{}: {}/{}".format(node['name'],
-                                                  node['healthy'],
-                                                  node['total']),
-                               curses.color_pair(2 if node['healthy'] == node['total'] else 1))
-            movedown(self.window, 1, 1)
-        movedown(self.window, 1, 1)
-        self.window.addstr('SECONDARIES', curses.A_BOLD)
-        movedown(self.window, 2, 1)
-        for node in sorted(nodes['secondary'], key=itemgetter('name')):
-            self.window.addstr("{}: {}/{}".format(node['name'],
-                                                  node['healthy'],
-                                                  node['total']),
-                               curses.color_pair(2 if node['healthy'] == node['total'] else 1))
-            movedown(self.window, 1, 1)
+        rows = self.status_rows()
+        height = y - 4
+        self.offset = clamp_offset(self.offset, len(rows), height)
+        for line, row in enumerate(rows[self.offset:self.offset + height]):
+            if row is not None:
+                format_row, item = row
+                text, attributes = format_row(item)
+                self.window.addstr(3 + line, 1, text[:x - 2], attributes)
+        if len(rows) > height:
+            position = ' {}-{} of {} '.format(self.offset + 1, min(len(rows), self.offset + height), len(rows))
+            self.window.addstr(y - 1, max(1, x - 1 - len(position)), position[:x - 2])
 
     def get_nodes_status_for_render(self):
         nodes = {'primary': [], 'secondary': []}
-        for listener in self.data.listeners:
-            is_primary = self.data.get('{}.primary'.format(listener.node_name), False)
-            total_threads, healthy_threads = 0, 0
-            for thread in listener.threads:
-                total_threads += 1
-                latest = self.data.get('latest.{}.{}'.format(thread.node_name,
-                                                             thread.collector.name), 0)
-                if thread.is_alive() and (time.time() - int(latest) < 60
-                                          or thread.collector._infrequent):
-                    healthy_threads += 1
-            node_doc = {'name': listener.node_name,
-                        'total': total_threads, 'healthy': healthy_threads}
-            nodes['primary' if is_primary else 'secondary'].append(node_doc)
+        for node_doc in self.data.node_statuses():
+            nodes['primary' if node_doc['primary'] else 'secondary'].append(node_doc)
         return nodes
 
+def format_millis(millis):
+    if millis < 1000:
+        return '{:.0f}ms'.format(millis)
+    return '{:.1f}s'.format(millis / 1000.0)
+
+def heat(fraction):
+    """Attributes for a heatmap cell holding fraction of the hottest value."""
+    if fraction >= 0.66:
+        return curses.color_pair(1) | curses.A_REVERSE | curses.A_BOLD
+    if fraction >= 0.33:
+        return curses.color_pair(1) | curses.A_BOLD
+    if fraction > 0:
+        return curses.color_pair(3)
+    return curses.A_DIM
+
 class MongoTopView(CollectorView):
+    """The namespaces with the most time in the chosen metric summed over
+    the cluster. The heatmap has a row per namespace and a column per node;
+    LEFT and RIGHT scroll through the nodes when they do not all fit."""
+    LABEL_WIDTH = 32
+    TOTAL_WIDTH = 8
+
     def __init__(self, *args, **kwargs):
         super(MongoTopView, self).__init__(*args, **kwargs)
         self.menu = MongoTopMenu(self.collector_name)
+        self.node_offset = 0
+
+    @property
+    def metric(self):
+        return (self.menu.get_active_in_group('metric') or ['total'])[0]
+
+    @property
+    def title(self):
+        return '{} - hottest namespaces by {} time'.format(self.collector_name, self.metric)
+
+    def process_char(self, char):
+        if char == curses.KEY_LEFT:
+            self.node_offset = max(0, self.node_offset - 1)
+        elif char == curses.KEY_RIGHT:
+            self.node_offset += 1
 
     def update_subwindow(self):
-        pass
+        view_mode = (self.menu.get_active_in_group('view_mode') or [None])[0]
+        if view_mode == c.HEATMAP:
+            self.draw_heatmap()
+        elif view_mode == c.TEXT:
+            self.draw_ranking()
+
+    def draw_ranking(self):
+        height, width = self.subwindow.getmaxyx()
+        self.subwindow.addstr(0, 0, '{:<40} {:>8}  {}'.format('NAMESPACE', self.metric.upper(),
+                                                             'HOTTEST NODE')[:width - 1], curses.A_BOLD)
+        for row, namespace in enumerate(self.data.hottest_namespaces(self.metric, max(0, height - 1)), 1):
+            node, value = max(namespace['nodes'].items(), key=itemgetter(1))
+            self.subwindow.addstr(row, 0, '{:<40} {:>8}  {} ({})'.format(namespace['namespace'][:40],
+                                                                        format_millis(namespace['value']),
+                                                                        node, format_millis(value))[:width - 1])
+
+    def draw_heatmap(self):
+        height, width = self.subwindow.getmaxyx()
+        nodes = [node['name'] for node in self.data.config['nodes']]
+        cell_width = max(7, min(13, max([len(node) for node in nodes] or [0]) + 1))
+        # the namespaces give up width before the last node column does
+        room = width - 1 - self.TOTAL_WIDTH
+        label_width = max(0, min(self.LABEL_WIDTH, max(20, width // 3), room - cell_width))
+        columns = max(0, (room - label_width) // cell_width)
+        self.node_offset = clamp_offset(self.node_offset, len(nodes), columns)
+        shown = nodes[self.node_offset:self.node_offset + columns]
+        hottest = self.data.hottest_namespaces(self.metric, max(0, height - 1), shown)
+
+        label = 'NAMESPACE'
+        if len(shown) < len(nodes):
+            label += ' {}-{}/{}'.format(self.node_offset + 1, self.node_offset + len(shown), len(nodes))
+        header = label[:max(0, label_width - 1)].ljust(label_width) + 'CLUSTER'.rjust(self.TOTAL_WIDTH - 1) + ' '
+        header += ''.join(node[:cell_width - 1].rjust(cell_width - 1) + ' ' for node in shown)
+        self.subwindow.addstr(0, 0, header[:width - 1], curses.A_BOLD)
+        if not hottest:
+            return
+        peak = max(max(namespace['nodes'].values() or [0]) for namespace in hottest) or 1
+        for row, namespace in enumerate(hottest, 1):
+            self.subwindow.addstr(row, 0, (namespace['namespace'][:max(0, label_width - 1)].ljust(label_width)
+                                           + format_millis(namespace['value']).rjust(self.TOTAL_WIDTH - 1))
+                                  [:width - 1])
+            for column, node in enumerate(shown):
+                x = label_width + self.TOTAL_WIDTH + column * cell_width
+                if x >= width - 1:
+                    break
+                value = namespace['nodes'].get(node, 0)
+                self.subwindow.addstr(row, x, (format_millis(value) if value else '-')
+                                      .rjust(cell_width - 1)[:width - 1 - x],
+                                      heat(value / float(peak)))
 
 class MongoStatView(CollectorView):
     def __init__(self, *args, **kwargs):
@@ -169,24 +322,112 @@ class MongoStatView(CollectorView):
     def update_subwindow(self):
         pass
 
-class TailView(CollectorView):
+class StreamView(CollectorView):
+    """Shows the lines from every node for a line-based collector. "/" opens
+    a search prompt over all retained lines, PAGE UP/PAGE DOWN scroll and
+    ESC goes back to following the newest lines."""
     def __init__(self, *args, **kwargs):
-        super(TailView, self).__init__(*args, **kwargs)
-        self.menu = TailMenu(self.collector_name)
+        super(StreamView, self).__init__(*args, **kwargs)
         self.widget = StreamWidget(self.data)
+        self.widget.source_keys = ["{}.{}".format(self.collector_name, node)
+                                   for node in map(itemgetter('name'), self.data.config['nodes'])]
+        self.query = None
+        self.typed = ''
+
+    @property
+    def title(self):
+        if self.query is None:
+            return self.collector_name
+        return '{} - {} matches for "{}"'.format(self.collector_name,
+                                                 len(self.widget.datums or []), self.query)
+
+    def process_char(self, char):
+        if self.capturing_input:
+            self.process_prompt_char(char)
+        elif char == '/':
+            self.capturing_input = True
+            self.typed = ''
+            self.data.set('prompt', '/')
+        elif char == chr(27):
+            self.query = None
+            self.widget.datums = None
+            self.widget.offset = 0
+        elif char == curses.KEY_PPAGE:
+            self.widget.offset += self.subwindow.getmaxyx()[0]
+        elif char == curses.KEY_NPAGE:
+            self.widget.offset = max(0, self.widget.offset - self.subwindow.getmaxyx()[0])
+
+    def process_prompt_char(self, char):
+        if char == curses.KEY_ENTER:
+            self.query = self.typed or None
+            self.widget.datums = None if self.query is None else SearchResults(self.data, self.query,
+                                                                               self.widget.source_keys)
+            self.widget.offset = 0
+        elif char == chr(27):
+            pass
+        elif char in (curses.KEY_BACKSPACE, chr(127), chr(8)):
+            self.typed = self.typed[:-1]
+            self.data.set('prompt', '/' + self.typed)
+            return
+        elif isinstance(char, str) and ' ' <= char <= '~':
+            self.typed += char
+            self.data.set('prompt', '/' + self.typed)
+            return
+        else:
+            return
+        self.capturing_input = False
+        self.data.set('prompt', None)
 
     def update_subwindow(self):
-        # get keys we are currently interested in from menu settings
-        from operator import itemgetter
-        current_keys = ["TailSlowLog.{}".format(node)
-                        for node in map(itemgetter('name'), self.data.config['nodes'])]
-        self.widget.source_keys = current_keys
+        if self.widget.datums is not None:
+            self.widget.datums.update()
         self.widget.apply_to_window(self.subwindow)
 
-class TailGrepView(CollectorView):
+class TailView(StreamView):
+    def __init__(self, *args, **kwargs):
+        super(TailView, self).__init__(*args, **kwargs)
+        self.menu = TailMenu(self.collector_name)
+
+class TailGrepView(StreamView):
     def __init__(self, *args, **kwargs):
         super(TailGrepView, self).__init__(*args, **kwargs)
         self.menu = TailGrepMenu(self.collector_name)
 
-    def update_subwindow(self):
-        pass
+class DiagnosticsView(View):
+    """Shows the memory held by each series and its part of the search
+    index against the memory budget."""
+    def __init__(self, *args, **kwargs):
+        super(DiagnosticsView, self).__init__(*args, **kwargs)
+        self.menu = DiagnosticsMenu()
+        self.offset = 0
+
+    def process_char(self, char):
+        height = self.window.getmaxyx()[0] - 7
+        if char == curses.KEY_PPAGE:
+            self.offset = max(0, self.offset - height)
+        elif char == curses.KEY_NPAGE:
+            self.offset += height
+
+    def render(self):
+        self.window.clear()
+        self.window.border(0)
+        self.window.addstr(1, 1, 'DIAGNOSTICS', curses.A_BOLD)
+        y, x = self.window.getmaxyx()
+        usage = self.data.series_usage()
+        index_bytes = sum(map(itemgetter('index_bytes'), usage))
+        summary = 'Holding {} in {} series, {} of it the search index'.format(
+            format_bytes(sum(map(itemgetter('bytes'), usage)) + index_bytes), len(usage), format_bytes(index_bytes))
+        if self.data.memory_budget:
+            summary += ' of a {} budget'.format(format_bytes(self.data.memory_budget))
+        self.window.addstr(3, 1, summary[:x - 2])
+        self.window.addstr(5, 1, '{:<40} {:>8} {:>8} {:>8} {:>4}'.format('SERIES', 'LINES', 'BYTES', 'INDEX',
+                                                                      'PRI')[:x - 2],
+                           curses.A_BOLD)
+        height = max(0, y - 7)
+        self.offset = clamp_offset(self.offset, len(usage), height)
+        for row, series in enumerate(usage[self.offset:self.offset + height]):
+            self.window.addstr(6 + row, 1, '{:<40} {:>8} {:>8} {:>8} {:>4}'.format(series['key'][:40],
+                                                                                  series['lines'],
+                                                                                  format_bytes(series['bytes']),
+                                                                                  format_bytes(series['index_bytes']),
+                                                                                  series['priority'])[:x - 2])
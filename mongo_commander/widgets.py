@@ -5,8 +5,6 @@ They then draw directly onto the window."""
 
 from operator import itemgetter
 
-from .curses_util import movedown, movex
-
 class Widget(object):
     def __init__(self, data):
         self.data = data
@@ -16,21 +14,39 @@ class Widget(object):
         raise NotImplementedError()
 
 class StreamWidget(Widget):
-    """Display line-by-line text data from a stream."""
-    def _gather_data(self):
-        return reduce(list.__add__, map(lambda key: self.data.get(key, []), self.source_keys))
+    """Display line-by-line text data from a stream. The newest lines that
+    fit are shown, scrolled back by `offset` lines. If `datums` is set, those
+    are shown instead of the source keys, e.g. for search results. Only
+    the visible slice of `datums` is taken, so it can be a sequence that
+    reads its lines lazily."""
+    def __init__(self, data):
+        super(StreamWidget, self).__init__(data)
+        self.offset = 0
+        self.datums = None
+
+    def _gather_data(self, limit):
+        """The newest `limit` lines of each source key, oldest first."""
+        if self.datums is not None:
+            return self.datums
+        gathered = []
+        for key in self.source_keys:
+            gathered.extend(self.data.get(key, [])[-1 * limit:])
+        return sorted(gathered, key=itemgetter('time'))
 
     def apply_to_window(self, window):
-        data_for_render = self._gather_data()
+        height, width = window.getmaxyx()
+        data_for_render = self._gather_data(height + self.offset)
         if not data_for_render:
             return
-        window.move(0, 0)
-        first_jump = len(data_for_render[0]['time'].strftime('%c')) + 3
-        second_jump = first_jump + max(map(len, map(itemgetter('node_name'), data_for_render))) + 3
-        for datum in sorted(data_for_render, key=itemgetter('time'))[-10:]:
-            window.addstr('{} - '.format(datum['time'].strftime('%c')))
-            movex(window, first_jump)
-            window.addstr('{} - '.format(datum['node_name']))
-            movex(window, second_jump)
-            window.addstr(str(datum['data']).strip())
-            movedown(window, x=0)
+        self.offset = max(0, min(self.offset, len(data_for_render) - height))
+        end = len(data_for_render) - self.offset
+        visible = data_for_render[max(0, end - height):end]
+        if not visible:
+            return
+        first_jump = len(visible[0]['time'].strftime('%c')) + 3
+        second_jump = max(map(len, map(itemgetter('node_name'), visible))) + 3
+        for row, datum in enumerate(visible):
+            line = '{} - '.format(datum['time'].strftime('%c')).ljust(first_jump)
+            line += '{} - '.format(datum['node_name']).ljust(second_jump)
+            line += str(datum['data']).strip()
+            window.addstr(row, 0, line[:width - 1])
@@ -4,25 +4,47 @@ display data aggregated by the various collectors."""
 
 import time
 import curses
+import logging
 import threading
 
 from . import views
 
 MENU_WIDTH = 40
 STATUS_WIDTH = 40
+MIN_SIDE_WIDTH = 16
+MIN_MAIN_WIDTH = 40
+MIN_ROWS = 8
+MIN_COLS = 2 * MIN_SIDE_WIDTH + 10
 
 def setup_window(window):
     window.keypad(1)
     window.immedok(True)
 
+def layout(rows, cols):
+    """Return the (height, width, y, x) of each window on a rows by cols
+    screen. The menu and status panes keep their full width while the main
+    pane has at least MIN_MAIN_WIDTH columns, and shrink evenly after that."""
+    spare = max(0, cols - MIN_MAIN_WIDTH)
+    menu_width = max(MIN_SIDE_WIDTH, min(MENU_WIDTH, spare // 2))
+    status_width = max(MIN_SIDE_WIDTH, min(STATUS_WIDTH, spare - menu_width))
+    return {'title': (1, cols, 0, 0),
+            'mini': (1, cols, rows - 1, 0),
+            'menu': (rows - 2, menu_width, 1, 0),
+            'status': (rows - 2, status_width, 1, cols - status_width),
+            'main': (rows - 2, cols - (menu_width + status_width), 1, menu_width)}
+
 class WindowManager(object):
-    def __init__(self, data):
+    def __init__(self, data, started_at=None):
         self.data = data
+        self.started_at = started_at
         self.screen = None
         self.render_thread = None
         self.windows = {}
         self.views = {}
         self.render_thread = None
+        # held while views render or the windows are rebuilt for a new size
+        self.render_lock = threading.RLock()
+        self.too_small = False
 
     def start(self):
         self.screen = curses.initscr()
@@ -58,30 +80,34 @@ class WindowManager(object):
         view_class = self.view_class_for_collector(collector_doc)
         view = view_class(self.data, self.windows['main'], collector_name)
         self.views['main'] = view
-        self.views['main'].render()
         self.change_to_view_menu(view)
 
+    def change_to_diagnostics(self):
+        self.views['main'] = views.DiagnosticsView(self.data, self.windows['main'])
+        self.change_to_view_menu(self.views['main'])
+
     def change_to_view_menu(self, view):
         self.views['menu'].menu = view.menu
-        self.views['menu'].render()
 
     def change_to_main_menu(self):
         menu_view = views.MenuView(self, self.data, self.windows['menu'])
         menu_view.menu.on_change(self.change_main_view)
         self.views['menu'] = menu_view
-        menu_view.render()
 
-    def _create_windows(self):
+    def _layout_windows(self):
+        """Create a window for each pane sized to the current screen. On a
+        screen too small for the panes the old windows are kept and nothing
+        is drawn until it grows again."""
         y, x = self.screen.getmaxyx()
+        self.too_small = y < MIN_ROWS or x < MIN_COLS
+        if self.too_small and self.windows:
+            return
+        for name, geometry in layout(y, x).items():
+            self.windows[name] = curses.newwin(*geometry)
+            setup_window(self.windows[name])
 
-        self.windows['title'] = curses.newwin(1, x, 0, 0)
-        self.windows['mini'] = curses.newwin(1, x, y-1, 0)
-        self.windows['menu'] = curses.newwin(y - 2, MENU_WIDTH, 1, 0)
-        self.windows['status'] = curses.newwin(y - 2, STATUS_WIDTH, 1, x - STATUS_WIDTH)
-        self.windows['main'] = curses.newwin(y - 2, x - (MENU_WIDTH + STATUS_WIDTH), 1, MENU_WIDTH)
-
-        for window in self.windows.values():
-            setup_window(window)
+    def _create_windows(self):
+        self._layout_windows()
 
         self.views['title'] = views.TitleView(self.data, self.windows['title'])
         self.views['mini'] = views.MiniView(self.data, self.windows['mini'])
@@ -94,18 +120,49 @@ class WindowManager(object):
         self.change_to_view_menu(self.views['main'])
 
     def _redraw_windows(self):
-        y, x = self.screen.getmaxyx()
-        self.screen.clear()
-        curses.resizeterm(y, x)
-        self.screen.refresh()
-
-    def _periodic_render(self):
-        while True:
+        """Rebuild the windows after the terminal was resized and hand them
+        to the current views."""
+        with self.render_lock:
+            y, x = self.screen.getmaxyx()
+            self.screen.clear()
+            curses.resizeterm(y, x)
+            self.screen.refresh()
+            self._layout_windows()
+            for name, view in self.views.items():
+                view.set_window(self.windows[name])
+            if self.too_small:
+                self.screen.addstr(0, 0, 'Terminal too small'[:max(0, x - 1)])
+                return
+            self._render_views()
+
+    def render_view(self, view):
+        """Draw view without sending anything to the terminal yet. The
+        windows normally refresh on every write, which would cost a
+        terminal update per row."""
+        view.window.immedok(False)
+        try:
+            view.render()
+        finally:
+            view.window.immedok(True)
+        view.window.noutrefresh()
+
+    def _render_views(self):
+        with self.render_lock:
+            if self.too_small:
+                return
             for view in self.views.values():
                 try:
-                    view.render()
+                    self.render_view(view)
                 except:
                     pass
+            curses.doupdate()
+
+    def _periodic_render(self):
+        while True:
+            self._render_views()
+            if self.started_at is not None:
+                logging.info('First frame drawn {:.3f}s after start'.format(time.time() - self.started_at))
+                self.started_at = None
             time.sleep(1)
 
     def _start_render_thread(self):
@@ -118,13 +175,37 @@ class WindowManager(object):
             char = self.screen.getch()
             if char == 10:
                 char = curses.KEY_ENTER
-            if char >= 0 and char <= 255:
-                char = chr(char).lower()
-            if char == 'q':
-                self.close()
-                break
-            if char == 'm':
-                self.change_to_main_menu()
+            if char == curses.KEY_RESIZE:
+                self._redraw_windows()
                 continue
-            for view in self.views.values():
-                view.process_char(char)
+            with self.render_lock:
+                if self._process_char(char) is False:
+                    break
+                # drawn here rather than by the views themselves, so a view
+                # that cannot draw is handled as it is in the render thread
+                self._render_views()
+
+    def _process_char(self, char):
+        """Dispatch a key to the views. Returns False when the app should
+        exit."""
+        if self.too_small:
+            if char == ord('q'):
+                self.close()
+                return False
+            return
+        if self.views['main'].capturing_input:
+            self.views['main'].process_char(chr(char) if 0 <= char <= 255 else char)
+            return
+        if char >= 0 and char <= 255:
+            char = chr(char).lower()
+        if char == 'q':
+            self.close()
+            return False
+        if char == 'm':
+            self.change_to_main_menu()
+            return
+        if char == 'd':
+            self.change_to_diagnostics()
+            return
+        for view in self.views.values():
+            view.process_char(char)
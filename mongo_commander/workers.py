@@ -0,0 +1,185 @@
+"""Optional worker processes for collection. With `workers` set in the
+config (or --workers), the nodes are split between that many processes.
+Each runs the usual listener threads for its nodes, so SSH, line reading
+and building datums use their own core instead of sharing the UI
+process's GIL. Alert rules and hotspots only concern a node's own lines,
+so the worker evaluates them too, and finds the search tokens of each log
+line. What the collectors push is batched in the worker, by series and
+with only the newest value of anything set, and sent to the UI process
+over a pipe with the tokens, the alerts firing and the changed hotspots.
+There the batches are fed into ClusterData."""
+
+import os
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+
+from .data import ClusterData
+from .search import tokenize
+from .collectors import get_collector_class
+
+BATCH_INTERVAL = 0.1  # seconds between batches from a worker
+WORKER_NICENESS = 5  # workers yield to the UI process when cores are short
+MAX_PENDING_LINES = 50000  # collectors wait for the UI process beyond this
+
+class WorkerData(ClusterData):
+    """Stands in for ClusterData in a worker process. Pushes and sets from
+    the collector threads are held until the next batch is shipped."""
+    def __init__(self, config, ssh_password, ssh_client_factory=None):
+        self._worker_config = config
+        self._worker_ssh_password = ssh_password
+        super(WorkerData, self).__init__(None, ssh_client_factory)
+        self.workers = 0
+        self.batch_lock = threading.Lock()
+        self.shipped = threading.Condition(self.batch_lock)
+        self.pending_pushes = OrderedDict()  # dot_key -> (retention, values, tokens or None)
+        self.pending_sets = OrderedDict()  # dot_key -> newest value
+        self.pending_lines = 0
+        self.shipped_alerts = []
+        self.hotspots.record_changes()
+
+    def load_config(self):
+        self.config = self._worker_config
+        self.ssh_password = self._worker_ssh_password
+
+    def push(self, dot_key, value, retention=None):
+        for observer in self.observers:
+            observer.pushed(dot_key, value)
+        tokens = None
+        if isinstance(value, dict) and value.get('collector_name') in self.search_index.collector_names:
+            # a string pickles faster than a set of them
+            tokens = ' '.join(tokenize(str(value['data'])))
+        with self.batch_lock:
+            while self.pending_lines >= MAX_PENDING_LINES:
+                self.shipped.wait()
+            pending = self.pending_pushes.get(dot_key)
+            if pending is None:
+                pending = self.pending_pushes[dot_key] = (retention, [], None if tokens is None else [])
+            pending[1].append(value)
+            if pending[2] is not None:
+                pending[2].append(tokens)
+            self.pending_lines += 1
+
+    def set(self, dot_key, value):
+        with self.batch_lock:
+            self.pending_sets[dot_key] = value
+
+    def take_batch(self):
+        with self.batch_lock:
+            pushes, self.pending_pushes = self.pending_pushes, OrderedDict()
+            sets, self.pending_sets = self.pending_sets, OrderedDict()
+            self.pending_lines = 0
+            self.shipped.notify_all()
+        batch = {'pushes': [(dot_key, retention, values, tokens)
+                            for dot_key, (retention, values, tokens) in pushes.items()],
+                 'sets': list(sets.items()),
+                 'hotspots': self.hotspots.take_changes(),
+                 'alive': [(thread.node_name, thread.collector.name, thread.is_alive())
+                           for listener in self.listeners for thread in listener.threads]}
+        # copied, as the engine goes on updating the values of its alerts
+        alerts = [dict(alert) for alert in self.alerts.firing_alerts()]
+        if alerts != self.shipped_alerts:
+            batch['alerts'] = self.shipped_alerts = alerts
+        return batch
+
+    def ship_forever(self, connection):
+        while True:
+            time.sleep(BATCH_INTERVAL)
+            try:
+                connection.send(self.take_batch())
+            except (IOError, OSError, EOFError):
+                # the UI process has gone away
+                return
+
+def run_worker(config, ssh_password, ssh_client_factory, connection):
+    # Ctrl-C is for the UI process, which takes its workers with it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(os, 'nice'):
+        os.nice(WORKER_NICENESS)
+    data = WorkerData(config, ssh_password, ssh_client_factory)
+    data.start_polling()
+    data.ship_forever(connection)
+
+class _WorkerThread(object):
+    """What node_statuses needs to know about a collector thread running
+    in a worker process."""
+    def __init__(self, process, node_name, collector):
+        self.process = process
+        self.node_name = node_name
+        self.collector = collector
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive and self.process.is_alive()
+
+class WorkerListener(object):
+    """Takes the place of a NodeListenerController in the UI process for a
+    node collected by a worker."""
+    def __init__(self, data, node_doc, process):
+        self.data = data
+        self.node_name = node_doc.get('name')
+        self.node_address = node_doc.get('host')
+        self.node_mongo_port = node_doc.get('mongo_port', 27017)
+        self.threads = [_WorkerThread(process, self.node_name,
+                                      get_collector_class(collector_doc)(data, self, collector_doc))
+                        for collector_doc in data.config['collectors']]
+
+class WorkerPool(object):
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+        self.processes = []
+        # the workers evaluate the alert rules and hotspots for their own
+        # nodes, so here those only take in what the workers send
+        data.observers = [observer for observer in data.observers
+                          if observer not in (data.alerts, data.hotspots)]
+
+    def start(self):
+        nodes = self.data.nodes
+        shards = [nodes[index::self.count] for index in range(min(self.count, len(nodes)))]
+        receivers = []
+        # every worker is forked before any receiving thread is started
+        for shard in shards:
+            config = dict(self.data.config, nodes=shard)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_worker,
+                                              args=(config, self.data.ssh_password,
+                                                    self.data.ssh_client_factory, sender))
+            process.daemon = True
+            process.start()
+            sender.close()
+            self.processes.append(process)
+            listeners = [WorkerListener(self.data, node_doc, process) for node_doc in shard]
+            self.data.listeners.extend(listeners)
+            receivers.append((receiver, listeners))
+        for worker, (receiver, listeners) in enumerate(receivers):
+            thread = threading.Thread(target=self._receive, args=(worker, receiver, listeners))
+            thread.daemon = True
+            thread.start()
+
+    def _receive(self, worker, receiver, listeners):
+        threads = dict(((thread.node_name, thread.collector.name), thread)
+                       for listener in listeners for thread in listener.threads)
+        while True:
+            try:
+                batch = receiver.recv()
+            except (IOError, OSError, EOFError):
+                logging.error('Collection worker for {} exited'.format(
+                    ', '.join(listener.node_name for listener in listeners)))
+                for thread in threads.values():
+                    thread.alive = False
+                return
+            for dot_key, retention, values, tokens in batch['pushes']:
+                self.data.push_many(dot_key, values, retention,
+                                    tokens and [line_tokens.split() for line_tokens in tokens])
+            self.data.hotspots.apply(batch['hotspots'])
+            if 'alerts' in batch:
+                self.data.alerts.mirror(worker, batch['alerts'])
+            for dot_key, value in batch['sets']:
+                self.data.set(dot_key, value)
+            for node_name, collector_name, alive in batch['alive']:
+                if (node_name, collector_name) in threads:
+                    threads[(node_name, collector_name)].alive = alive
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_commander.data import ClusterData
+
+CONFIG = {'ssh': {'user': 'test', 'auth_type': 'key'},
+          'nodes': [{'name': 'db1', 'host': 'db1.example.com'}],
+          'collectors': [{'name': 'TailLog', 'type': 'Tail', 'file': '/logs/mongo/db.log'},
+                         {'name': 'MongoStat', 'type': 'MongoStat'}]}
+
+class StaticConfigData(ClusterData):
+    """ClusterData with its config given directly instead of read from a
+    file."""
+    def __init__(self, config):
+        self._static_config = config
+        super(StaticConfigData, self).__init__(None)
+
+    def load_config(self):
+        self.config = self._static_config
+        self.ssh_password = None
+
+@pytest.fixture
+def make_data():
+    def make(**config):
+        return StaticConfigData(dict(CONFIG, **config))
+    return make
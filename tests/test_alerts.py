@@ -0,0 +1,61 @@
+import time
+
+from mongo_commander.alerts import AlertEngine, RateRule
+
+def stat(node, qr):
+    return {'data': '{} 0 0'.format(qr), 'node_name': node, 'collector_name': 'MongoStat'}
+
+def test_notifications_are_delivered_off_the_push_path(tmp_path):
+    alerts_file = tmp_path / 'alerts.log'
+    engine = AlertEngine([{'name': 'QueuedReads', 'collector': 'MongoStat', 'field': 'qr',
+                           'threshold': 50}],
+                         alerts_file=str(alerts_file), alerts_hook='sleep 1')
+    engine.pushed('MongoStat.db1', {'data': 'qr qw ar', 'node_name': 'db1', 'collector_name': 'MongoStat'})
+    started = time.time()
+    engine.pushed('MongoStat.db1', stat('db1', 80))
+    engine.pushed('MongoStat.db1', stat('db1', 10))
+    assert time.time() - started < 0.5
+    engine.notifications.join()
+    lines = alerts_file.read_text().splitlines()
+    assert [line.split()[-4:-1] for line in lines] == [['FIRING', 'QueuedReads', 'db1'],
+                                                       ['RESOLVED', 'QueuedReads', 'db1']]
+    assert engine.firing_alerts() == []
+
+def test_rate_windows_of_quiet_subjects_are_dropped():
+    rule = RateRule({'name': 'Errors', 'collector': 'TailLog', 'rate': True, 'threshold': 10,
+                     'per': 60, 'group': r'\[(conn\d+)\]'})
+    for connection in range(100):
+        datum = {'data': '[conn{}] error'.format(connection), 'node_name': 'db1'}
+        assert rule.evaluate(datum, None, 1000.0) == ('db1:conn{}'.format(connection), 1)
+    assert len(rule.windows) == 100
+    assert rule.current('db1:conn1', 1030.0) == 1
+    assert rule.current('db1:conn1', 1060.0) == 0
+    assert 'db1:conn1' not in rule.windows
+    rule.evaluate({'data': '[conn5000] error', 'node_name': 'db1'}, None, 1061.0)
+    assert list(rule.windows) == ['db1:conn5000']
+
+def test_a_gap_between_breaching_values_starts_the_duration_over():
+    engine = AlertEngine([{'name': 'QueuedReads', 'collector': 'MongoStat', 'field': 'qr',
+                           'threshold': 50, 'for': 10, 'interval': 2}])
+    rule = engine.rules[0]
+    engine._update(rule, 'db1', 80, 1000.0)
+    engine._update(rule, 'db1', 80, 1009.0)
+    # db1 did not report between 1009 and 1025, so it was not seen breaching
+    engine._update(rule, 'db1', 80, 1025.0)
+    assert engine.firing == {}
+    engine._update(rule, 'db1', 80, 1030.0)
+    engine._update(rule, 'db1', 80, 1035.0)
+    assert engine.firing_alerts()[0]['since'] == 1025.0
+
+def test_pending_subjects_that_stop_reporting_are_dropped():
+    engine = AlertEngine([{'name': 'SlowQuery', 'collector': 'TailLog', 'pattern': r'(\d+)ms',
+                           'group': r'\[(conn\d+)\]', 'threshold': 100, 'for': 30}])
+    rule = engine.rules[0]
+    for connection in range(100):
+        engine._update(rule, 'db1:conn{}'.format(connection), 500, 1000.0)
+    assert len(engine.pending) == 100
+    engine._sweep_pending(1020.0)
+    assert len(engine.pending) == 100
+    engine._update(rule, 'db1:conn5000', 500, 1040.0)
+    engine._sweep_pending(1040.0)
+    assert list(engine.pending) == [('SlowQuery', 'db1:conn5000')]
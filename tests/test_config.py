@@ -0,0 +1,32 @@
+import os
+import json
+
+from mongo_commander.config import cache_path, load_config
+
+def write_config(tmp_path, text):
+    config_path = tmp_path / 'config.yml'
+    config_path.write_text(text)
+    return str(config_path)
+
+def test_an_unchanged_config_is_read_from_the_json_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    config_path = write_config(tmp_path, 'nodes:\n  - {name: db1, host: db1.example.com}\nworkers: 2\n')
+    config = load_config(config_path)
+    assert config == {'nodes': [{'name': 'db1', 'host': 'db1.example.com'}], 'workers': 2}
+    with open(cache_path(config_path)) as f:
+        cached = json.load(f)
+    assert cached['config'] == config
+
+    cached['config']['workers'] = 4
+    with open(cache_path(config_path), 'w') as f:
+        json.dump(cached, f)
+    assert load_config(config_path)['workers'] == 4
+    assert load_config(config_path, use_cache=False)['workers'] == 2
+
+def test_configs_json_cannot_hold_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    for text in ('started: 2026-01-01\n', 'ports: {27017: db1}\n'):
+        config_path = write_config(tmp_path, text)
+        config = load_config(config_path)
+        assert load_config(config_path) == config
+        assert not os.path.exists(cache_path(config_path))
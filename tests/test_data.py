@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from mongo_commander.data import LineReader
+from mongo_commander.retention import value_size
+
+def line(text):
+    return {'data': text, 'time': datetime(2026, 1, 1), 'node_name': 'db1', 'collector_name': 'TailLog'}
+
+def test_total_size_counts_the_search_index(make_data):
+    data = make_data()
+    for index in range(100):
+        data.push('TailLog.db1', line('slow query {} on app.users'.format(index)))
+        data.push('MongoStat.db1', {'data': 'insert {}'.format(index), 'time': datetime(2026, 1, 1)})
+    usage = dict((series['key'], series) for series in data.series_usage())
+    assert usage['TailLog.db1']['index_bytes'] > 0
+    assert usage['MongoStat.db1']['index_bytes'] == 0
+    assert data.total_size == (sum(series['bytes'] for series in usage.values())
+                               + data.search_index.nbytes('TailLog.db1')
+                               + data.search_index.vocabulary_nbytes)
+
+def test_evicting_lines_releases_their_index(make_data):
+    data = make_data()
+    for index in range(10):
+        data.push('TailLog.db1', line('connection accepted'), 10)
+    for index in range(10):
+        data.push('TailLog.db1', line('slow query on app.events'), 10)
+    assert len(data.get('TailLog.db1')) == 10
+    assert data.search('accepted') == []
+    assert data.total_size == (value_size(line('slow query on app.events')) * 10
+                               + data.search_index.nbytes('TailLog.db1')
+                               + data.search_index.vocabulary_nbytes)
+
+def test_memory_budget_includes_the_search_index(make_data):
+    data = make_data(memory_budget='50k')
+    for index in range(2000):
+        data.push('TailLog.db1', line('slow query on app.users took a while'))
+    assert data.total_size <= 50000
+    lines = len(data.get('TailLog.db1'))
+    assert data.total_size > lines * value_size(line('slow query on app.users took a while'))
+    assert len(data.search('slow query')) == lines
+
+def test_push_many_in_chunks_matches_pushing_one_at_a_time(make_data):
+    chunked, single = make_data(), make_data()
+    values = [line('query {}'.format(index)) for index in range(1000)]
+    chunked.push_many('TailLog.db1', values, 600)
+    for value in values:
+        single.push('TailLog.db1', value, 600)
+    assert chunked.get('TailLog.db1') == single.get('TailLog.db1') == values[-600:]
+    assert chunked.get_since('TailLog.db1', 990) == (1000, values[-10:])
+    assert chunked.total_size == single.total_size
+    assert len(chunked.search('query')) == 600
+
+class Channel(object):
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    def recv(self, nbytes):
+        return self.outputs.pop(0) if self.outputs else b''
+
+def test_line_reader_returns_lines_as_they_complete():
+    reader = LineReader(Channel([b'one\ntw', b'o\n', b'thr\xc3', b'\xa9e\nfour']))
+    assert reader.read() == ['one\n']
+    assert reader.read() == ['two\n']
+    assert reader.read() == []
+    assert reader.read() == [u'thr\u00e9e\n']
+    assert reader.read() == ['four']
+    assert reader.read() is None
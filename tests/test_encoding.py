@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import random
+from datetime import datetime, timedelta, tzinfo
+
+import pytest
+
+from mongo_commander.encoding import CompressedSeries, CODECS, ESCAPE, RECORD, DICTIONARY_BASE
+
+START = datetime(2026, 1, 1, 12, 30, 15, 123456)
+
+TEXTS = [u'Mon Apr 25 00:00:00.243 [conn9916] insert sessions.events query: { team_id: 1 }',
+         u'  two  leading spaces and two  inside ',
+         u'',
+         u'private use  abc x {} {}{} alone'.format(ESCAPE, ESCAPE, ESCAPE),
+         u'',
+         u'unicode caf\xe9 中文 tokens',
+         u'multi\nline\tand tab',
+         u'a {} b'.format(chr(DICTIONARY_BASE + 1))]
+
+def datum(index, data=None):
+    if data is None:
+        data = TEXTS[index % len(TEXTS)] + u' {}'.format(index if index % 3 else u'')
+    return {'data': data, 'time': START + timedelta(microseconds=index * 1001),
+            'node_name': 'db1', 'collector_name': 'TailLog', 'collector_type': 'Tail'}
+
+@pytest.mark.parametrize('codec', sorted(CODECS))
+def test_lines_round_trip_through_blocks(codec):
+    series = CompressedSeries(codec, hot_lines=4, block_lines=8)
+    datums = [datum(index) for index in range(100)]
+    for item in datums:
+        series.append(item)
+    assert len(series.blocks) == 12 and all(block.payload is not None for block in series.blocks)
+    assert series[:] == datums
+    assert [series[index] for index in range(-100, 100, 7)] == [datums[index] for index in range(-100, 100, 7)]
+    assert series[5:29:3] == datums[5:29:3]
+    # decoded again, not from the cache
+    series._cache.clear()
+    assert list(series) == datums
+
+def test_blocks_that_cannot_be_encoded_are_kept_plain():
+    series = CompressedSeries(hot_lines=2, block_lines=4)
+    odd = [datum(0, b'bytes data'),
+           datum(1, u'has a {} record separator'.format(RECORD)),
+           datum(2, u'fine'),
+           dict(datum(3), time=START.replace(tzinfo=_UTC())),
+           datum(4, u'fine'),
+           dict(datum(5), extra=1),
+           datum(6, u'fine'),
+           dict(datum(7), node_name='db2')]
+    datums = []
+    for item in odd:
+        datums.extend([item, datum(10), datum(11), datum(12)])
+    for item in datums:
+        series.append(item)
+    assert series[:] == datums
+    assert type(series[0]['data']) is bytes
+
+def test_deleting_from_the_front_matches_a_list():
+    rng = random.Random(7)
+    series = CompressedSeries(hot_lines=4, block_lines=8)
+    model = []
+    for index in range(400):
+        item = datum(index)
+        series.append(item)
+        model.append(item)
+        if rng.random() < 0.1:
+            # sometimes within the first block, sometimes past the blocks
+            # into the hot lines
+            count = rng.choice([1, 3, 8, 9, len(model) - len(series.hot) + 1, len(model)])
+            del series[:count]
+            del model[:count]
+        assert len(series) == len(model)
+        if index % 25 == 0:
+            assert series[:] == model
+    assert series[:] == model
+    if model:
+        assert series[-1] == model[-1] and series[0] == model[0]
+
+def test_readers_see_the_lines_as_they_were():
+    series = CompressedSeries(hot_lines=4, block_lines=8)
+    datums = [datum(index) for index in range(50)]
+    for item in datums:
+        series.append(item)
+    readers = [(start, stop, series.reader(start, stop))
+               for start, stop in [(0, 50), (3, 45), (40, 50), (-10, None), (20, 20)]]
+    for index in range(50, 70):
+        series.append(datum(index))
+    del series[:30]
+    for start, stop, read in readers:
+        assert read() == datums[start:stop]
+
+def test_only_deleting_from_the_front_is_supported():
+    series = CompressedSeries()
+    series.append(datum(0))
+    with pytest.raises(TypeError):
+        del series[1:]
+
+def test_nbytes_tracks_appends_and_deletes():
+    series = CompressedSeries(hot_lines=4, block_lines=8)
+    for index in range(64):
+        series.append(datum(index))
+    cold = series.cold_bytes
+    assert cold == sum(block.nbytes for block in series.blocks) > 0
+    del series[:len(series)]
+    assert len(series) == 0
+    assert series.cold_bytes == 0 and series.hot_bytes == 0
+
+class _UTC(tzinfo):
+    def utcoffset(self, moment):
+        return timedelta(0)
+
+    def dst(self, moment):
+        return timedelta(0)
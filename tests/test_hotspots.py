@@ -0,0 +1,92 @@
+import random
+from collections import defaultdict
+
+from mongo_commander.hotspots import METRICS, NamespaceTop, TopK
+from mongo_commander.parsers import parse_number
+
+HEADER = '                    ns       total        read       write\t\t2014-04-25T19:00:00\n'
+
+def brute_top(scores, count):
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:count]
+
+def test_top_k_matches_sorting_through_changes_and_removals():
+    rng = random.Random(7)
+    top, scores = TopK(), {}
+    for step in range(5000):
+        key = 'ns{}'.format(rng.randrange(40))
+        if rng.random() < 0.2:
+            # dropped keys leave their heap entries behind until they surface
+            top.set(key, 0)
+            scores.pop(key, None)
+        else:
+            delta = rng.randrange(-50, 100)
+            top.add(key, delta)
+            if scores.get(key, 0) + delta > 0:
+                scores[key] = scores.get(key, 0) + delta
+            else:
+                scores.pop(key, None)
+        assert top.scores == scores
+        assert len(top.heap) <= 2 * len(scores) + 65
+        if step % 7 == 0:
+            assert top.top(5) == brute_top(scores, 5)
+    assert top.top(100) == brute_top(scores, 100)
+
+def test_top_k_rebuilds_its_heap_once_stale_entries_pile_up():
+    top = TopK()
+    for score in range(1, 1000):
+        top.set('busy', score)
+    assert len(top.heap) <= 2 * len(top) + 64
+    assert top.top(3) == [('busy', 999)]
+
+def test_hottest_matches_summing_and_sorting_each_tick():
+    rng = random.Random(3)
+    namespaces = ['app.ns{}'.format(index) for index in range(12)]
+    nodes = ['db1', 'db2', 'db3']
+    top = NamespaceTop(['MongoTop'])
+    ended = dict((node, {}) for node in nodes)  # node -> namespace -> values of its last whole tick
+    state = {}  # node -> namespace -> values now
+    for tick in range(30):
+        for node in nodes:
+            # the header that starts a tick ends the one before it, zeroing
+            # whatever that one did not report
+            top.pushed('MongoTop.' + node, {'data': HEADER, 'node_name': node, 'collector_name': 'MongoTop'})
+            rows = {}
+            for namespace in rng.sample(namespaces, rng.randrange(len(namespaces))):
+                times = ['{}ms'.format(rng.choice([0, rng.randrange(500)])) for metric in METRICS]
+                line = '{:>22} {:>11} {:>11} {:>11}\n'.format(namespace, *times)
+                top.pushed('MongoTop.' + node, {'data': line, 'node_name': node, 'collector_name': 'MongoTop'})
+                rows[namespace] = tuple(parse_number(value) for value in times)
+            # rows only replace the previous tick's values until the next header
+            state[node] = dict((namespace, values) for namespace, values in dict(ended[node], **rows).items()
+                               if any(values))
+            ended[node] = rows
+            assert top.current.get(node, {}) == state[node]
+        for index, metric in enumerate(METRICS):
+            sums = defaultdict(float)
+            for node in nodes:
+                for namespace, values in state[node].items():
+                    sums[namespace] += values[index]
+            expected = [(namespace, value) for namespace, value in brute_top(sums, 5) if value > 0]
+            hottest = top.hottest(metric, 5)
+            assert [(spot['namespace'], spot['value']) for spot in hottest] == expected
+            assert [spot['nodes'] for spot in hottest] == [
+                dict((node, state[node].get(namespace, (0.0, 0.0, 0.0))[index]) for node in nodes)
+                for namespace, value in expected]
+
+def test_end_tick_zeroes_namespaces_that_went_quiet():
+    top = NamespaceTop(['MongoTop'])
+    def push(line):
+        top.pushed('MongoTop.db1', {'data': line, 'node_name': 'db1', 'collector_name': 'MongoTop'})
+    push(HEADER)
+    push('             app.users       391ms       197ms       194ms\n')
+    push('            app.events       225ms       215ms        10ms\n')
+    push(HEADER)
+    push('             app.users       100ms        50ms        50ms\n')
+    assert [spot['namespace'] for spot in top.hottest()] == ['app.events', 'app.users']
+    push(HEADER)
+    assert [(spot['namespace'], spot['value']) for spot in top.hottest()] == [('app.users', 100)]
+    assert top.current == {'db1': {'app.users': (100.0, 50.0, 50.0)}}
+    # a tick that reports nothing leaves nothing behind
+    push(HEADER)
+    assert top.hottest() == []
+    assert top.current == {'db1': {}}
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+from mongo_commander.remote import CollectorServer, RemoteClusterData, SYNC_LINES, parse_address
+from mongo_commander.retention import Retention
+from mongo_commander.search import SearchResults
+
+@pytest.fixture
+def served(make_data):
+    data = make_data()
+    server = CollectorServer(data, ('127.0.0.1', 0))
+    server.start()
+    client = RemoteClusterData(server.server_address)
+    yield data, client
+    client._disconnect()
+    server.shutdown()
+    server.server_close()
+
+def test_sync_pulls_subscribed_series_and_values(served):
+    data, client = served
+    data.push('TailLog.db1', {'data': 'first', 'time': datetime(2026, 1, 1)})
+    data.set('status.db1', 'up')
+    assert client.get('TailLog.db1', None) is None
+    assert client.get('status.db1', None) is None
+    client.sync()
+    assert [datum['data'] for datum in client.get('TailLog.db1')] == ['first']
+    assert client.get('TailLog.db1')[0]['time'] == datetime(2026, 1, 1)
+    assert client.get('status.db1') == 'up'
+
+    data.push('TailLog.db1', {'data': 'second', 'time': datetime(2026, 1, 2)})
+    client.sync()
+    assert [datum['data'] for datum in client.get('TailLog.db1')] == ['first', 'second']
+
+def test_sync_skips_keys_missing_on_the_server(served):
+    data, client = served
+    data.push('TailLog.db1', {'data': 'line', 'time': datetime(2026, 1, 1)})
+    assert client.get('MongoStat.db1', None) is None
+    assert client.get('TailLog.db1', None) is None
+    client.sync()
+    assert client.get('MongoStat.db1', None) is None
+    assert len(client.get('TailLog.db1')) == 1
+
+def test_local_keys_are_not_subscribed(served):
+    data, client = served
+    client.set('prompt', '/error')
+    assert client.get('prompt') == '/error'
+    assert 'prompt' not in client._subscriptions
+    client.sync()
+    assert client.get('prompt') == '/error'
+
+def test_search_results_through_the_client(served):
+    data, client = served
+    line = {'time': datetime(2026, 1, 1), 'node_name': 'db1', 'collector_name': 'TailLog'}
+    data.push('TailLog.db1', dict(line, data='error one'))
+    results = SearchResults(client, 'error', ['TailLog.db1'])
+    results.update()
+    data.push('TailLog.db1', dict(line, data='error two', time=datetime(2026, 1, 2)))
+    results.update()
+    assert [datum['data'] for datum in results[:]] == ['error one', 'error two']
+
+def test_parse_address_defaults_to_localhost():
+    assert parse_address('7017') == ('localhost', 7017)
+    assert parse_address('0.0.0.0:7017') == ('0.0.0.0', 7017)
+    assert parse_address('collector-host:7017') == ('collector-host', 7017)
+
+def test_clients_hold_only_the_newest_lines_of_long_series(served):
+    data, client = served
+    retention = Retention(lines=5000, compress='zlib')
+    for number in range(3000):
+        data.push('TailLog.db1', {'data': 'line {}'.format(number), 'time': datetime(2026, 1, 1),
+                                  'node_name': 'db1', 'collector_name': 'TailLog',
+                                  'collector_type': 'Tail'}, retention)
+    client.get('TailLog.db1', None)
+    client.sync()
+    assert client.get('TailLog.db1') == data.get('TailLog.db1')[-SYNC_LINES:]
+    for number in range(3000, 3010):
+        data.push('TailLog.db1', {'data': 'line {}'.format(number), 'time': datetime(2026, 1, 1),
+                                  'node_name': 'db1', 'collector_name': 'TailLog',
+                                  'collector_type': 'Tail'})
+    client.sync()
+    assert client.get('TailLog.db1') == data.get('TailLog.db1')[-SYNC_LINES:]
+    assert client.get('TailLog.db1')[-1]['data'] == 'line 3009'
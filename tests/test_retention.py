@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from mongo_commander.retention import Retention, parse_bytes, value_size
+
+START = datetime(2026, 1, 1)
+
+def series(count, seconds_apart=1, text='x' * 50):
+    return [{'data': text, 'time': START + timedelta(seconds=index * seconds_apart)}
+            for index in range(count)]
+
+def size(values):
+    return sum(map(value_size, values))
+
+def test_excess_by_lines():
+    values = series(10)
+    assert Retention(lines=10).excess(values, size(values)) == 0
+    assert Retention(lines=7).excess(values, size(values)) == 3
+
+def test_excess_by_age_of_the_newest_line():
+    values = series(10, seconds_apart=10)
+    # the newest line is at 90s, so lines older than 60s drop
+    assert Retention(seconds=60).excess(values, size(values)) == 3
+    assert Retention(seconds=60, lines=5).excess(values, size(values)) == 5
+
+def test_excess_by_bytes():
+    values = series(10)
+    line_size = value_size(values[0])
+    assert Retention(bytes=line_size * 10).excess(values, size(values)) == 0
+    assert Retention(bytes=line_size * 4).excess(values, size(values)) == 6
+    assert Retention(bytes=line_size * 4 + 1).excess(values, size(values)) == 6
+    # a compressed series is assumed to cost the same per line
+    assert Retention(bytes=250, compress=True).excess(values, 1000) == 8
+
+def test_excess_always_keeps_the_newest_value():
+    values = series(5, seconds_apart=100)
+    assert Retention(seconds=1).excess(values, size(values)) == 4
+    assert Retention(bytes=1).excess(values, size(values)) == 4
+    assert Retention(bytes=1, compress=True).excess(values, size(values)) == 4
+    assert Retention(lines=1).excess(values[:1], size(values[:1])) == 0
+
+def test_coerce_and_parse_bytes():
+    assert Retention.coerce(None) is None
+    assert Retention.coerce(5).lines == 5
+    assert parse_bytes('64k') == 64000
+    assert parse_bytes(1024) == 1024
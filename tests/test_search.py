@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from mongo_commander.retention import Retention
+from mongo_commander.search import LogIndex, SearchResults
+
+START = datetime(2026, 1, 1)
+
+def push_lines(data, node, lines, start=0, retention=None):
+    for index, line in enumerate(lines, start):
+        data.push('TailLog.{}'.format(node), {'data': line, 'time': START + timedelta(seconds=index),
+                                              'node_name': node, 'collector_name': 'TailLog'},
+                  retention)
+
+def test_search_finds_lines_containing_the_query(make_data):
+    data = make_data()
+    push_lines(data, 'db1', ['slow query on app.users', 'connection accepted', 'Slow QUERY on app.events'])
+    assert [datum['data'] for datum in data.search('slow query')] == ['slow query on app.users',
+                                                                      'Slow QUERY on app.events']
+    assert [datum['data'] for datum in data.search('app.ev')] == ['Slow QUERY on app.events']
+    assert data.search('missing') == []
+
+def test_search_finds_words_inside_unindexed_ids(make_data):
+    data = make_data()
+    push_lines(data, 'db1', ["find { _id: ObjectId('5f3adeadbe1f') }", 'conn12 deadline passed', 'fine'])
+    assert [datum['data'] for datum in data.search('dead')] == ["find { _id: ObjectId('5f3adeadbe1f') }",
+                                                                'conn12 deadline passed']
+    assert [datum['data'] for datum in data.search('5f3ade')] == ["find { _id: ObjectId('5f3adeadbe1f') }"]
+    assert [datum['data'] for datum in data.search('conn1')] == ['conn12 deadline passed']
+
+def test_search_results_only_check_new_lines(make_data):
+    data = make_data()
+    keys = ['TailLog.db1', 'TailLog.db2']
+    push_lines(data, 'db1', ['error one', 'fine'])
+    results = SearchResults(data, 'error', keys)
+    results.update()
+    assert [datum['data'] for datum in results[:]] == ['error one']
+
+    checked = []
+    lookup = data.search_index.lookup
+    data.search_index.lookup = lambda dot_key: checked.append(dot_key) or lookup(dot_key)
+    # db2's lines are older than db1's, so they sort in front
+    push_lines(data, 'db2', ['error two', 'fine again'], start=-5)
+    push_lines(data, 'db1', ['error three'], start=10)
+    del checked[:]
+    results.update()
+    assert sorted(checked) == keys
+    assert [datum['data'] for datum in results[:]] == ['error two', 'error one', 'error three']
+    assert [datum['data'] for datum in results[1:]] == ['error one', 'error three']
+    assert results[-1]['data'] == 'error three'
+    assert [datum['data'] for datum in results[:]] == [datum['data'] for datum in data.search('error', keys)]
+
+def test_search_results_drop_evicted_lines(make_data):
+    data = make_data()
+    push_lines(data, 'db1', ['error one', 'error two', 'fine'], retention=3)
+    results = SearchResults(data, 'error', ['TailLog.db1'])
+    results.update()
+    assert len(results) == 2
+    push_lines(data, 'db1', ['fine', 'error three'], start=3, retention=3)
+    results.update()
+    assert [datum['data'] for datum in results[:]] == ['error three']
+
+def test_positions_follow_pushes_and_evictions():
+    series = {'TailLog.db1': [], 'TailLog.db2': []}
+    index = LogIndex(['TailLog'], series.get)
+    for number in range(10):
+        for dot_key in sorted(series):
+            datum = {'data': 'line {} of {}'.format(number, dot_key), 'time': START,
+                     'collector_name': 'TailLog'}
+            series[dot_key].append(datum)
+            index.pushed(dot_key, datum)
+    evicted, series['TailLog.db1'][:4] = series['TailLog.db1'][:4], []
+    index.evicted('TailLog.db1', evicted)
+
+    assert len(index) == 16
+    assert index.position('TailLog.db1', 3) is None
+    assert index.position('TailLog.db1', 4) == 0
+    assert index.position('TailLog.db1', 9) == 5
+    assert index.position('TailLog.db1', 10) is None
+    assert index.position('TailLog.db2', 0) == 0
+    assert index.position('TailLog.db3', 0) is None
+    found = index.find('line 6')
+    assert [(dot_key, push) for _, dot_key, push in found['matches']] == [('TailLog.db1', 6),
+                                                                         ('TailLog.db2', 6)]
+    assert found['first'] == {'TailLog.db1': 4, 'TailLog.db2': 0}
+    assert found['next'] == {'TailLog.db1': 10, 'TailLog.db2': 10}
+    assert [datum['data'] for datum in index.resolve(found['matches'])] == ['line 6 of TailLog.db1',
+                                                                           'line 6 of TailLog.db2']
+    assert len(index.search('of')) == 16
+    # a query of digits alone has no postings to narrow it down
+    assert [datum['data'] for datum in index.search('2', ['TailLog.db1'])] == []
+    assert [datum['data'] for datum in index.search('7', ['TailLog.db1'])] == ['line 7 of TailLog.db1']
+
+def test_search_points_into_compressed_series(make_data):
+    data = make_data()
+    retention = Retention(lines=700, compress='zlib')
+    for number in range(1000):
+        data.push('TailLog.db1', {'data': 'request {} from app{}'.format(number, number % 7),
+                                  'time': START + timedelta(seconds=number), 'node_name': 'db1',
+                                  'collector_name': 'TailLog', 'collector_type': 'Tail'}, retention)
+    assert len(data.get('TailLog.db1')) == 700
+    found = data.search('from app3')
+    assert [datum['data'] for datum in found] == ['request {} from app3'.format(number)
+                                                  for number in range(300, 1000) if number % 7 == 3]
+    assert [datum['data'] for datum in data.search('request 301 ')] == ['request 301 from app0']
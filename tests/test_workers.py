@@ -0,0 +1,38 @@
+import multiprocessing
+from datetime import datetime
+
+from mongo_commander.workers import WorkerData, WorkerPool
+
+TOP = ['                    ns       total        read       write\t\t2014-04-25T19:00:00\n',
+       '             app.users       391ms       197ms       194ms\n',
+       '            app.events       225ms       215ms        10ms\n']
+
+def test_batches_from_a_worker_match_pushing_directly(make_data):
+    extra = {'collectors': [{'name': 'TailLog', 'type': 'Tail', 'file': '/logs/mongo/db.log'},
+                            {'name': 'MongoTop', 'type': 'MongoTop'}],
+             'alerts': [{'name': 'SlowQueries', 'collector': 'TailLog', 'pattern': r'(?P<value>\d+)ms',
+                         'threshold': 100}]}
+    direct, data = make_data(**extra), make_data(**extra)
+    worker = WorkerData(data.config, None)
+    pushes = [('TailLog.db1', {'data': 'query on app.users took {}ms'.format(millis)})
+              for millis in (50, 150, 200)]
+    pushes += [('MongoTop.db1', {'data': line}) for line in TOP + TOP[:2] + TOP[:1]]
+    for dot_key, datum in pushes:
+        datum.update(time=datetime(2026, 1, 1), node_name='db1', collector_name=dot_key.split('.')[0])
+        direct.push(dot_key, datum)
+        worker.push(dot_key, datum)
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    sender.send(worker.take_batch())
+    sender.close()
+    pool = WorkerPool(data, 1)
+    pool._receive(0, receiver, [])
+
+    assert data.alerts.evaluations == 0
+    for alerts in (data.firing_alerts(), direct.firing_alerts()):
+        assert [(alert['name'], alert['subject'], alert['value']) for alert in alerts] == [
+            ('SlowQueries', 'db1', 200)]
+    assert data.hottest_namespaces() == direct.hottest_namespaces() == [
+        {'namespace': 'app.users', 'value': 391, 'nodes': {'db1': 391}}]
+    assert data.search('took 150') == direct.search('took 150')
+    assert len(data.search('app.users')) == 3